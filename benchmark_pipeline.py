@@ -0,0 +1,364 @@
+"""Benchmark the question pipeline on synthetic question banks.
+
+Generates QB.xlsx workbooks of configurable size (sheets, rows, image and
+formatted-overlay density), then times the app's main stages against them:
+
+    load_questions        cold (compile from Excel) and warm (compiled cache)
+    start_quiz            sampling a quiz and resolving its formatted overlay
+    compute_results       grading a fully answered quiz
+    render_quiz           resolving the quiz's formatted fields and rendering each
+                          displayed text field, as the quiz page does
+
+Each stage also reports peak traced memory and process RSS. Firestore is
+replaced by the in-memory stand-in, so the run is fully offline and the
+number of backend reads per stage is reported too.
+
+Usage:
+    python benchmark_pipeline.py --sizes 100,1000,10000 --output bench.json
+    python benchmark_pipeline.py --compare old.json new.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+import psutil
+
+import overlay_store
+import question_bank_store
+from inmemory_firestore import InMemoryFirestore
+
+
+# =============================
+# Configuration
+# =============================
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+DEFAULT_SHEETS = 1
+DEFAULT_IMAGE_RATIO = 0.2
+DEFAULT_OVERLAY_DENSITY = 0.1
+DEFAULT_QUIZ_QUESTIONS = 100
+RESULTS_VERSION = 1
+
+SUBJECTS = ["History", "Geography", "Indian Constitution", "Economics", "Science And Technology",
+            "General English", "Simple Arithmetic", "Regional Language (Malayalam)"]
+OVERLAY_FIELDS = ["question", "option_a", "option_b", "option_c", "option_d", "explanation"]
+SHEET_HEADER = [
+    "Question", "Option A", "Option B", "Option C", "Option D",
+    "Correct option (Provisional Answer Key)", "Correct Option (Final Answer Key)",
+    "Explanation", "Marks/Question", "Negative Marks/Question", "Time in Minute/Question",
+    "Subjects Covered", "Exam Year", "Question Image", "Explanation Image",
+]
+
+
+# =============================
+# Synthetic Data
+# =============================
+def generate_question_bank(path, rows, sheets=DEFAULT_SHEETS, image_ratio=DEFAULT_IMAGE_RATIO, seed=0):
+    """Write a synthetic QB.xlsx with `rows` questions spread over `sheets` sheets."""
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    per_sheet = [rows // sheets + (1 if idx < rows % sheets else 0) for idx in range(sheets)]
+
+    for sheet_idx, sheet_rows in enumerate(per_sheet):
+        worksheet = workbook.create_sheet(f"Mock Test {sheet_idx + 1}")
+        worksheet.append(SHEET_HEADER)
+        for row_idx in range(sheet_rows):
+            key = rng.choice("ABCD")
+            image = (f"https://drive.google.com/file/d/img{sheet_idx}_{row_idx}/view"
+                     if rng.random() < image_ratio else None)
+            worksheet.append([
+                f"Question {row_idx + 1}: " + " ".join(rng.choice(["which", "of", "the", "following",
+                                                                    "statements", "is", "correct"])
+                                                       for _ in range(25)),
+                f"Option A for {row_idx}", f"Option B for {row_idx}",
+                f"Option C for {row_idx}", f"Option D for {row_idx}",
+                "ABCD".index(key) + 1, key,
+                "Explanation " + "because " * 40,
+                1, 0.33, 0.75 if row_idx == 0 else None,
+                rng.choice(SUBJECTS), rng.randint(2010, 2024),
+                image, None,
+            ])
+    workbook.save(path)
+    return path
+
+
+def generate_overlay(file_path, sheet_question_ids, density=DEFAULT_OVERLAY_DENSITY, seed=0):
+    """Formatted-question overlay covering `density` of every sheet's fields.
+
+    sheet_question_ids maps each sheet to its question IDs in row order.
+    """
+    rng = random.Random(seed)
+    overlay = overlay_store.OverlayIndex()
+    for sheet_name, question_ids in sheet_question_ids.items():
+        for row_idx, question_id in enumerate(question_ids):
+            for field in OVERLAY_FIELDS:
+                if rng.random() < density:
+                    overlay.set(file_path, sheet_name, question_id, field, f"<b>Formatted {field} {row_idx}</b>")
+    return overlay
+
+
+def write_overlay(db, overlay):
+    """Store an OverlayIndex in the sharded Firestore layout."""
+    version = overlay_store.new_version_stamp()
+    versions = {}
+    shards = (db.collection(overlay_store.OVERLAY_COLLECTION)
+              .document(overlay_store.SHARDS_DOCUMENT)
+              .collection(overlay_store.SHARD_COLLECTION))
+    for bank, sheet, sheet_overlay in overlay.sheets():
+        sid = overlay_store.shard_id(bank, sheet)
+        shards.document(sid).set(overlay_store.shard_document(bank, sheet, sheet_overlay, version))
+        versions[sid] = version
+    db.collection(overlay_store.OVERLAY_COLLECTION).document(overlay_store.VERSION_DOCUMENT).set(
+        {"shards": versions, overlay_store.KEYED_BY_FIELD: overlay_store.KEYED_BY_QUESTION_ID})
+
+
+# =============================
+# Harness
+# =============================
+class BenchmarkSessionState(dict):
+    """Attribute-style dict standing in for st.session_state."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def import_app(db):
+    """Import the app with Firestore replaced by the in-memory stand-in."""
+    import streamlit as st
+    import streamlit_projectk_app as app
+
+    st.session_state = BenchmarkSessionState()
+    app.db = db
+    return app, st
+
+
+def measure(func, trace_memory=False):
+    """Run func once and return (result, metrics).
+
+    Metrics hold wall time, process RSS and its growth over the call. With
+    trace_memory the peak of Python allocations is recorded as well; tracing
+    slows the call down, so timings from such runs are not comparable.
+    """
+    gc.collect()
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+    metrics = {"seconds": round(seconds, 4)}
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        metrics["peak_mb"] = round(peak / 1024 / 1024, 2)
+    rss = process.memory_info().rss
+    metrics["rss_mb"] = round(rss / 1024 / 1024, 1)
+    metrics["rss_delta_mb"] = round((rss - rss_before) / 1024 / 1024, 1)
+    return result, metrics
+
+
+def run_scenario(app, st, db, workdir, rows, sheets, image_ratio, overlay_density, quiz_questions, seed,
+                 trace_memory=False):
+    bank_dir = os.path.join(workdir, f"bank_{rows}")
+    os.makedirs(bank_dir, exist_ok=True)
+    path = os.path.join(bank_dir, question_bank_store.QB_FILE_NAME)
+    generate_question_bank(path, rows, sheets, image_ratio, seed)
+    artifact_dir = question_bank_store.get_artifact_dir(path)
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+
+    stages = {}
+
+    def load_all(bank):
+        for sheet_name in bank:
+            bank[sheet_name]
+        return bank
+
+    bank, stages["load_questions_cold"] = measure(lambda: load_all(app.load_questions(path)), trace_memory)
+    bank, stages["load_questions_warm"] = measure(lambda: load_all(app.load_questions(path)), trace_memory)
+    sheet_name = next(iter(bank))
+    df = bank[sheet_name]
+
+    overlay = generate_overlay(
+        path, {name: bank[name][question_bank_store.QUESTION_ID_COLUMN].tolist() for name in bank},
+        overlay_density, seed
+    )
+    # The shared cache's snapshot listener picks these writes up as they land
+    write_overlay(db, overlay)
+
+    st.session_state.clear()
+    st.session_state.current_qb_path = path
+    st.session_state.selected_sheet = sheet_name
+    n = min(quiz_questions, len(df))
+    db.reset_stats()
+    _, stages["start_quiz"] = measure(lambda: app.start_quiz(df, n, 60, True, "Benchmark"), trace_memory)
+    stages["start_quiz"]["firestore_reads"] = db.stats()["reads"]
+
+    rng = random.Random(seed)
+    st.session_state.answers = {i: rng.choice("ABCD") for i in range(n)}
+    st.session_state.question_status = {i: {"answer": st.session_state.answers[i], "marked": False}
+                                        for i in range(n)}
+    st.session_state.username = "benchmark"
+    (_, summary), stages["compute_results"] = measure(app.compute_results, trace_memory)
+
+    quiz = st.session_state.quiz_questions
+    # Images are fetched and shown by display_question_image, not rendered here
+    columns = [display_column for field, (_, display_column) in app.DISPLAY_FIELDS.items()
+               if field != "question_image"]
+
+    def render_all():
+        # The same path as the quiz page: materialize once, then render every
+        # displayed field, starting from an empty fragment cache
+        app.render_fragment.cache_clear()
+        rendered = app.materialize_formatted_fields(quiz.copy())
+        for idx in range(len(rendered)):
+            row = rendered.iloc[idx]
+            sl_no = row.get("Sl No", idx + 1)
+            for column in columns:
+                content = row[column]
+                app.render_fragment(str(content) if content else "",
+                                    sl_no if column == "Display Question" else None)
+
+    db.reset_stats()
+    _, stages["render_quiz"] = measure(render_all, trace_memory)
+    stages["render_quiz"]["calls"] = len(quiz) * len(columns)
+    stages["render_quiz"]["firestore_reads"] = db.stats()["reads"]
+
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    return {
+        "rows": rows,
+        "sheets": sheets,
+        "image_ratio": image_ratio,
+        "overlay_density": overlay_density,
+        "overlay_entries": len(overlay),
+        "quiz_questions": n,
+        "workbook_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+        "sheet_memory_mb": round(int(df.memory_usage(deep=True).sum()) / 1024 / 1024, 2),
+        "correct": summary["Correct"],
+        "stages": stages,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, sheets, image_ratio, overlay_density, quiz_questions, seed=0, workdir=None,
+                   trace_memory=False):
+    db = InMemoryFirestore()
+    app, st = import_app(db)
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="qb_bench_")
+    try:
+        scenarios = []
+        for rows in sizes:
+            print(f"Benchmarking {rows} questions...", flush=True)
+            scenarios.append(run_scenario(app, st, db, workdir, rows, sheets, image_ratio,
+                                          overlay_density, quiz_questions, seed, trace_memory))
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "trace_memory": trace_memory,
+        "scenarios": scenarios,
+    }
+
+
+# =============================
+# Reporting
+# =============================
+def print_results(results):
+    print(f"\nCommit {results['commit']} • Python {results['python']} • pandas {results['pandas']}")
+    print(f"{'Rows':>8} {'Stage':<24} {'Seconds':>10} {'Peak MB':>10} {'RSS MB':>10} {'+RSS MB':>8} {'Reads':>8}")
+    for scenario in results["scenarios"]:
+        for stage, metrics in scenario["stages"].items():
+            print(f"{scenario['rows']:>8} {stage:<24} {metrics['seconds']:>10.4f} "
+                  f"{metrics.get('peak_mb', '-'):>10} {metrics['rss_mb']:>10.1f} "
+                  f"{metrics['rss_delta_mb']:>8.1f} {metrics.get('firestore_reads', ''):>8}")
+
+
+def compare_results(old, new):
+    """Print new/old time ratios for every stage both runs share."""
+    old_by_rows = {s["rows"]: s for s in old["scenarios"]}
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'Rows':>8} {'Stage':<24} {'Old (s)':>10} {'New (s)':>10} {'Ratio':>8}")
+    for scenario in new["scenarios"]:
+        previous = old_by_rows.get(scenario["rows"])
+        if not previous:
+            continue
+        for stage, metrics in scenario["stages"].items():
+            before = previous["stages"].get(stage)
+            if not before:
+                continue
+            ratio = metrics["seconds"] / before["seconds"] if before["seconds"] else float("nan")
+            print(f"{scenario['rows']:>8} {stage:<24} {before['seconds']:>10.4f} "
+                  f"{metrics['seconds']:>10.4f} {ratio:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated question counts")
+    parser.add_argument("--sheets", type=int, default=DEFAULT_SHEETS)
+    parser.add_argument("--image-ratio", type=float, default=DEFAULT_IMAGE_RATIO)
+    parser.add_argument("--overlay-density", type=float, default=DEFAULT_OVERLAY_DENSITY)
+    parser.add_argument("--quiz-questions", type=int, default=DEFAULT_QUIZ_QUESTIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep generated banks here instead of a temp folder")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record peak Python allocations (slows every stage)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f_old, open(args.compare[1], encoding="utf-8") as f_new:
+            compare_results(json.load(f_old), json.load(f_new))
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results = run_benchmarks(sizes, args.sheets, args.image_ratio, args.overlay_density,
+                             args.quiz_questions, args.seed, args.workdir, args.trace_memory)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
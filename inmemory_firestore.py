@@ -0,0 +1,451 @@
+"""In-memory stand-in for the Firestore client used by the app.
+
+Implements the subset of the google-cloud-firestore API the app relies on
+(collections, sub-collections, documents, simple queries, write batches,
+transactions, the Increment / DELETE_FIELD transforms and collection
+snapshot listeners)
+so benchmarks and local runs work offline. Every document read and write is counted, which makes it easy to
+see how many backend round trips a code path costs.
+
+Usage:
+    import streamlit_projectk_app as app
+    from inmemory_firestore import InMemoryFirestore
+    app.db = InMemoryFirestore()
+"""
+import copy
+import datetime
+import enum
+import threading
+import uuid
+
+
+# =============================
+# Field Paths and Transforms
+# =============================
+def split_field_path(field_path):
+    """Split 'a.b.`c.d`' into ['a', 'b', 'c.d'] as Firestore does."""
+    parts, current, quoted = [], [], False
+    for char in field_path:
+        if char == "`":
+            quoted = not quoted
+        elif char == "." and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _is_delete_field(value):
+    return type(value).__name__ == "Sentinel" and "delete" in str(value).lower()
+
+
+def _is_increment(value):
+    return type(value).__name__ == "Increment" and hasattr(value, "value")
+
+
+def _apply_value(target, key, value):
+    if _is_delete_field(value):
+        target.pop(key, None)
+    elif _is_increment(value):
+        current = target.get(key, 0)
+        target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+    elif isinstance(value, dict):
+        target[key] = _resolve_transforms(value)
+    else:
+        target[key] = copy.deepcopy(value)
+
+
+def _resolve_transforms(data):
+    resolved = {}
+    for key, value in data.items():
+        _apply_value(resolved, key, value)
+    return resolved
+
+
+def _merge_into(target, data):
+    """Deep-merge data into target, as set(..., merge=True) does."""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge_into(target[key], value)
+        else:
+            _apply_value(target, key, value)
+
+
+def _update_paths(target, data):
+    """Apply update() semantics: keys are field paths, values replace whole fields."""
+    for field_path, value in data.items():
+        parts = split_field_path(field_path)
+        node = target
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        _apply_value(node, parts[-1], value)
+
+
+def _get_field(data, field_path):
+    node = data
+    for part in split_field_path(field_path):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+
+def _order_key(value):
+    # Missing fields sort after every present value
+    return (value is None, value if value is not None else 0)
+
+
+# =============================
+# Snapshots and References
+# =============================
+class ChangeType(enum.Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+
+class Watch:
+    """Handle returned by on_snapshot(); unsubscribe() stops the callbacks."""
+
+    def __init__(self, client, collection_path, callback):
+        self._client = client
+        self.collection_path = collection_path
+        self.callback = callback
+
+    def unsubscribe(self):
+        self._client._remove_watch(self)
+
+
+class NotFound(Exception):
+    """Raised by update() on a missing document, like google.api_core's NotFound."""
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _get_field(self._data or {}, field_path)
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return CollectionReference(self._client, self.path + (name,))
+
+    def get(self, transaction=None):
+        # Transactions hold the client lock from begin to commit, so reads inside one are consistent
+        return self._client._read(self)
+
+    def set(self, data, merge=False):
+        self._client._write(self, data, "merge" if merge else "set")
+
+    def update(self, data):
+        self._client._write(self, data, "update")
+
+    def delete(self):
+        self._client._write(self, None, "delete")
+
+
+class Query:
+    def __init__(self, client, path, filters=(), orders=(), limit=None, start_after=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._start_after = start_after
+
+    def _copy(self, **changes):
+        params = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                      start_after=self._start_after)
+        params.update(changes)
+        return Query(self._client, self._path, **params)
+
+    def where(self, field_path, op, value):
+        return self._copy(filters=self._filters + ((field_path, op, value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document):
+        values = document.to_dict() if isinstance(document, DocumentSnapshot) else document
+        return self._copy(start_after=values)
+
+    def _matches(self, data):
+        for field_path, op, value in self._filters:
+            actual = _get_field(data, field_path)
+            if op == "==" and actual != value:
+                return False
+            if op == "!=" and actual == value:
+                return False
+            if op in ("<", "<=", ">", ">="):
+                if actual is None:
+                    return False
+                if op == "<" and not actual < value:
+                    return False
+                if op == "<=" and not actual <= value:
+                    return False
+                if op == ">" and not actual > value:
+                    return False
+                if op == ">=" and not actual >= value:
+                    return False
+            if op == "in" and actual not in value:
+                return False
+            if op == "array_contains" and value not in (actual or []):
+                return False
+        return True
+
+    def stream(self):
+        docs = [(path, data) for path, data in self._client._children(self._path) if self._matches(data)]
+        # Apply orderings from the last to the first so the first one wins
+        for field_path, direction in reversed(self._orders):
+            docs.sort(
+                key=lambda item, fp=field_path: _order_key(_get_field(item[1], fp)),
+                reverse=str(direction).upper().endswith("DESCENDING"),
+            )
+        if self._start_after is not None and self._orders:
+            cursor = tuple(_get_field(self._start_after, fp) for fp, _ in self._orders)
+            for idx, (_, data) in enumerate(docs):
+                if tuple(_get_field(data, fp) for fp, _ in self._orders) == cursor:
+                    docs = docs[idx + 1:]
+                    break
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        self._client._count_reads(max(1, len(docs)))
+        for path, data in docs:
+            yield DocumentSnapshot(DocumentReference(self._client, path), copy.deepcopy(data))
+
+    def get(self):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        """Call callback(docs, changes, read_time) now and after every change to the collection.
+
+        Filters and orderings are ignored; every document of the collection is watched.
+        """
+        return self._client._add_watch(self._path, callback)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = path[-1]
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, self._path + (document_id or uuid.uuid4().hex[:20],))
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def list_documents(self):
+        return [DocumentReference(self._client, path) for path, _ in self._client._children(self._path)]
+
+
+class WriteBatch:
+    """Collects writes and applies them together on commit()."""
+
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, data, merge=False):
+        self._ops.append((reference, data, "merge" if merge else "set"))
+
+    def update(self, reference, data):
+        self._ops.append((reference, data, "update"))
+
+    def delete(self, reference):
+        self._ops.append((reference, None, "delete"))
+
+    def commit(self):
+        with self._client._lock:
+            changed = [self._client._apply(reference, data, mode) for reference, data, mode in self._ops]
+        self._ops = []
+        self._client._notify(changed)
+
+
+class Transaction(WriteBatch):
+    """Serializable transaction usable with google.cloud.firestore's @transactional.
+
+    The client lock is held from _begin() to _commit() / _rollback(), so
+    transactions on one client run one at a time and never need retrying.
+    """
+
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._id = None
+
+    def _clean_up(self):
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._client._lock.acquire()
+        self._id = uuid.uuid4().hex
+
+    def _commit(self):
+        try:
+            changed = [self._client._apply(reference, data, mode) for reference, data, mode in self._ops]
+        finally:
+            self._clean_up()
+            self._client._lock.release()
+        self._client._notify(changed)
+        return []
+
+    def _rollback(self):
+        if self._id is not None:
+            self._clean_up()
+            self._client._lock.release()
+
+
+# =============================
+# Client
+# =============================
+class InMemoryFirestore:
+    """Thread-safe in-memory Firestore client with read/write counters."""
+
+    def __init__(self):
+        self._docs = {}
+        self._lock = threading.RLock()
+        self._watches = []
+        self.reads = 0
+        self.writes = 0
+
+    def collection(self, name):
+        return CollectionReference(self, (name,))
+
+    def document(self, path):
+        return DocumentReference(self, tuple(path.split("/")))
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self):
+        return Transaction(self)
+
+    def stats(self):
+        return {"reads": self.reads, "writes": self.writes, "documents": len(self._docs)}
+
+    def reset_stats(self):
+        self.reads = 0
+        self.writes = 0
+
+    def _count_reads(self, count):
+        with self._lock:
+            self.reads += count
+
+    def _children(self, collection_path):
+        depth = len(collection_path) + 1
+        with self._lock:
+            return [
+                (path, data) for path, data in sorted(self._docs.items())
+                if len(path) == depth and path[:-1] == collection_path
+            ]
+
+    def _read(self, reference):
+        with self._lock:
+            self.reads += 1
+            data = self._docs.get(reference.path)
+            return DocumentSnapshot(reference, copy.deepcopy(data) if data is not None else None)
+
+    def _write(self, reference, data, mode):
+        with self._lock:
+            changed = self._apply(reference, data, mode)
+        self._notify([changed])
+
+    def _apply(self, reference, data, mode):
+        """Apply one write; return (path, existed before) for the listeners."""
+        with self._lock:
+            self.writes += 1
+            existed = reference.path in self._docs
+            if mode == "delete":
+                self._docs.pop(reference.path, None)
+            elif mode == "set":
+                self._docs[reference.path] = _resolve_transforms(data)
+            elif mode == "merge":
+                _merge_into(self._docs.setdefault(reference.path, {}), data)
+            elif mode == "update":
+                if reference.path not in self._docs:
+                    raise NotFound(f"No document to update: {'/'.join(reference.path)}")
+                _update_paths(self._docs[reference.path], data)
+            return reference.path, existed
+
+    # -----------------------------
+    # Snapshot listeners
+    # -----------------------------
+    def _snapshot(self, path):
+        data = self._docs.get(path)
+        return DocumentSnapshot(DocumentReference(self, path), copy.deepcopy(data) if data is not None else None)
+
+    def _add_watch(self, collection_path, callback):
+        watch = Watch(self, collection_path, callback)
+        with self._lock:
+            self._watches.append(watch)
+            docs = [self._snapshot(path) for path, _ in self._children(collection_path)]
+            self.reads += max(1, len(docs))
+        changes = [DocumentChange(ChangeType.ADDED, doc) for doc in docs]
+        callback(docs, changes, datetime.datetime.now(datetime.timezone.utc))
+        return watch
+
+    def _remove_watch(self, watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _notify(self, changed):
+        """Deliver changes to listeners outside the client lock, as the real client does from its own thread."""
+        first_seen = {}
+        for path, existed in changed:
+            first_seen.setdefault(path, existed)
+        changed = list(first_seen.items())
+        deliveries = []
+        with self._lock:
+            for watch in list(self._watches):
+                changes = []
+                for path, existed in changed:
+                    if path[:-1] != watch.collection_path:
+                        continue
+                    doc = self._snapshot(path)
+                    if doc.exists:
+                        changes.append(DocumentChange(ChangeType.MODIFIED if existed else ChangeType.ADDED, doc))
+                    elif existed:
+                        changes.append(DocumentChange(ChangeType.REMOVED, doc))
+                if changes:
+                    self.reads += len(changes)
+                    docs = [self._snapshot(path) for path, _ in self._children(watch.collection_path)]
+                    deliveries.append((watch.callback, docs, changes))
+        read_time = datetime.datetime.now(datetime.timezone.utc)
+        for callback, docs, changes in deliveries:
+            callback(docs, changes, read_time)
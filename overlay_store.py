@@ -0,0 +1,635 @@
+"""Shared storage for formatted-question overlays.
+
+Editors can override how a question, its options, image or explanation is
+displayed. These overrides ("overlays") live in Firestore and are read on
+every question render, so the process keeps one shared copy and only
+goes back to the backend when it may be stale.
+
+In memory the overlay is an OverlayIndex: bank -> sheet -> field -> question
+ID -> value, so a lookup is one dict access and a sheet's overrides travel as
+a unit. Overrides are keyed by the content-derived question ID assigned at
+ingestion, so they resolve the same way however a quiz orders or rebuilds
+its questions. Firestore stores one document ("shard") per bank and sheet,
+so a save touches only the sheet that changed and readers fetch only the
+sheets they show. The original single-document layouts are converted in
+bulk by migrate_flat_overlay / legacy_index_from_document, and row-keyed
+overlays are rekeyed once with rekey_rows.
+
+This module deliberately does not import streamlit so it can be used from
+command-line tools and benchmarks.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+
+# =============================
+# Configuration
+# =============================
+OVERLAY_COLLECTION = "formatted_questions"
+SHARDS_DOCUMENT = "shards"
+SHARD_COLLECTION = "sheets"  # formatted_questions/shards/sheets/<shard id>, one per bank and sheet
+VERSION_DOCUMENT = "version"  # {"shards": {shard id: version stamp}, "keyed_by": KEYED_BY_QUESTION_ID}
+KEYED_BY_FIELD = "keyed_by"
+KEYED_BY_QUESTION_ID = "question_id"  # Shards written before this was set are keyed by sheet row
+# Single-document layouts, read only for migration (newest first)
+LEGACY_OVERLAY_DOCUMENTS = ["overlay_index", "all_questions"]
+VERSION_FIELD = "__version__"  # Stored in each shard so one read returns both
+SHARD_WRITE_BATCH = 400  # Firestore allows 500 writes per batch
+JOURNAL_FILE = "journal.jsonl"  # Append-only log of edits, next to the per-shard backup files
+JOURNAL_COMPACT_EVERY = 200  # Journal entries appended before folding them into the shard files
+DEFAULT_OVERLAY_TTL_SECONDS = 30
+LOCAL_FORMAT = "overlay_index"  # Marks a migrated formatted_questions.json
+
+OVERLAY_FIELDS = ["question", "question_image", "option_a", "option_b", "option_c", "option_d", "explanation"]
+FIELD_ALIASES = {"image": "question_image", "Question Image": "question_image"}
+
+
+def new_version_stamp():
+    """A version stamp that increases with every save, without reading first."""
+    return time.time_ns()
+
+
+def normalize_field(field):
+    return FIELD_ALIASES.get(field, field)
+
+
+# =============================
+# Overlay Index
+# =============================
+class SheetOverlay:
+    """One sheet's overrides: field -> {question id: value}."""
+
+    __slots__ = ("fields",)
+
+    def __init__(self, fields=None):
+        self.fields = fields if fields is not None else {}
+
+    def get(self, question_id, field, default=None):
+        value = self.fields.get(field, {}).get(question_id)
+        return default if value is None else value
+
+    def set(self, question_id, field, value):
+        self.fields.setdefault(field, {})[question_id] = value
+
+    def remove(self, question_id, field):
+        self.fields.get(field, {}).pop(question_id, None)
+
+    def apply(self, changes):
+        """Apply {(question id, field): value} in place; a value of None removes the override."""
+        for (question_id, field), value in changes.items():
+            if value is None:
+                self.remove(question_id, field)
+            else:
+                self.set(question_id, field, value)
+
+    def diff_row(self, question_id, values):
+        """{(question id, field): value} for the fields whose stored override would change."""
+        return {(question_id, field): value for field, value in values.items()
+                if self.get(question_id, field) != value}
+
+    def items(self):
+        """Yield (question id, field, value) for every override."""
+        for field, values in self.fields.items():
+            for question_id, value in values.items():
+                if value is not None:
+                    yield question_id, field, value
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def copy(self):
+        return SheetOverlay({field: dict(values) for field, values in self.fields.items()})
+
+    def to_storage(self):
+        """{field: {question id: value}}, without empty fields."""
+        stored = {}
+        for question_id, field, value in self.items():
+            stored.setdefault(field, {})[str(question_id)] = value
+        return stored
+
+    @classmethod
+    def from_storage(cls, data):
+        return cls({
+            field: {key: value for key, value in values.items() if value is not None}
+            for field, values in (data or {}).items()
+        })
+
+
+EMPTY_SHEET_OVERLAY = SheetOverlay()
+
+
+class OverlayIndex:
+    """All overlays, organized bank -> sheet -> SheetOverlay."""
+
+    def __init__(self, banks=None):
+        self._banks = banks if banks is not None else {}
+
+    def sheet(self, bank, sheet):
+        """The sheet's overrides (an empty, shared overlay if it has none)."""
+        return self._banks.get(bank, {}).get(sheet, EMPTY_SHEET_OVERLAY)
+
+    def get(self, bank, sheet, key, field, default=None):
+        return self.sheet(bank, sheet).get(key, normalize_field(field), default)
+
+    def set(self, bank, sheet, key, field, value):
+        sheets = self._banks.setdefault(bank, {})
+        sheets.setdefault(sheet, SheetOverlay()).set(key, normalize_field(field), value)
+
+    def remove(self, bank, sheet, key, field):
+        sheet_overlay = self._banks.get(bank, {}).get(sheet)
+        if sheet_overlay is not None:
+            sheet_overlay.remove(key, normalize_field(field))
+
+    def sheets(self):
+        """Yield (bank, sheet, SheetOverlay) for every sheet with overrides."""
+        for bank, sheets in self._banks.items():
+            for sheet, sheet_overlay in sheets.items():
+                yield bank, sheet, sheet_overlay
+
+    def __len__(self):
+        return sum(len(sheet_overlay) for _, _, sheet_overlay in self.sheets())
+
+    def copy(self):
+        return OverlayIndex({
+            bank: {sheet: sheet_overlay.copy() for sheet, sheet_overlay in sheets.items()}
+            for bank, sheets in self._banks.items()
+        })
+
+    def to_storage(self):
+        """{bank: {sheet: {field: {key: value}}}}, without empty sheets."""
+        stored = {}
+        for bank, sheet, sheet_overlay in self.sheets():
+            sheet_data = sheet_overlay.to_storage()
+            if sheet_data:
+                stored.setdefault(bank, {})[sheet] = sheet_data
+        return stored
+
+    @classmethod
+    def from_storage(cls, data):
+        return cls({
+            bank: {sheet: SheetOverlay.from_storage(fields) for sheet, fields in sheets.items()}
+            for bank, sheets in (data or {}).items()
+        })
+
+
+def parse_question_key(key):
+    """Split a flat "path::sheet::idx::field" key; None if it is malformed."""
+    parts = key.rsplit("::", 3)
+    if len(parts) != 4:
+        return None
+    bank, sheet, row, field = parts
+    try:
+        return bank, sheet, int(row), normalize_field(field)
+    except ValueError:
+        return None
+
+
+def migrate_flat_overlay(flat):
+    """Build a row-keyed OverlayIndex from the flat string-keyed layout.
+
+    Returns (index, skipped keys); rekey_rows() then maps rows to question
+    IDs. When both 'image' and 'question_image' exist for a row, the
+    'question_image' value wins, as the old lookup did.
+    """
+    index = OverlayIndex()
+    skipped = []
+    # Apply legacy aliases first so the canonical field overwrites them
+    for key in sorted(flat, key=lambda k: not any(k.endswith(f"::{alias}") for alias in FIELD_ALIASES)):
+        parsed = parse_question_key(key)
+        if parsed is None or key == VERSION_FIELD:
+            skipped.append(key)
+            continue
+        index.set(*parsed, flat[key])
+    return index, skipped
+
+
+def rekey_rows(sheet_overlay, question_ids):
+    """Rekey a row-keyed SheetOverlay by question ID.
+
+    question_ids lists the sheet's IDs in row order. Keys that are not row
+    numbers are already question IDs and are kept, so rekeying twice is
+    harmless. Returns (SheetOverlay, number of overrides dropped because
+    their row no longer exists).
+    """
+    rekeyed = SheetOverlay()
+    dropped = 0
+    for row, field, value in sheet_overlay.items():
+        try:
+            row = int(row)
+        except (TypeError, ValueError):
+            rekeyed.set(row, field, value)
+            continue
+        if question_ids is None or not 0 <= row < len(question_ids):
+            dropped += 1
+            continue
+        rekeyed.set(question_ids[row], field, value)
+    return rekeyed, dropped
+
+
+# =============================
+# Compaction
+# =============================
+def overlay_bytes(sheet_overlay):
+    """Approximate stored size of a sheet's overrides (UTF-8 JSON of the field map)."""
+    return len(json.dumps(sheet_overlay.to_storage(), ensure_ascii=False).encode("utf-8"))
+
+
+def compact_sheet_overlay(sheet_overlay, source):
+    """Drop overrides that are redundant or orphaned.
+
+    source maps each question ID of the sheet to its {field: original text},
+    or is None when the bank or sheet no longer exists. Returns (compacted
+    SheetOverlay, report) where report counts what was dropped and the bytes
+    before and after.
+    """
+    compacted = SheetOverlay()
+    report = {"kept": 0, "equal_to_source": 0, "missing_question": 0, "missing_sheet": 0}
+    for question_id, field, value in sheet_overlay.items():
+        if source is None:
+            report["missing_sheet"] += 1
+        elif question_id not in source:
+            report["missing_question"] += 1
+        elif value == source[question_id].get(field) or (field == "question_image" and not value):
+            # An empty image override already falls back to the source image
+            report["equal_to_source"] += 1
+        else:
+            compacted.set(question_id, field, value)
+            report["kept"] += 1
+    report["bytes_before"] = overlay_bytes(sheet_overlay)
+    report["bytes_after"] = overlay_bytes(compacted)
+    return compacted, report
+
+
+# =============================
+# Shards
+# =============================
+def shard_id(bank, sheet):
+    """Stable Firestore document id for one bank/sheet shard."""
+    return hashlib.sha1(f"{bank}::{sheet}".encode("utf-8")).hexdigest()[:24]
+
+
+def shard_document(bank, sheet, sheet_overlay, version):
+    return {"bank": bank, "sheet": sheet, "fields": sheet_overlay.to_storage(), VERSION_FIELD: version}
+
+
+def split_shard(document_data):
+    """Return (SheetOverlay, version stamp) from a stored shard document."""
+    data = document_data or {}
+    return SheetOverlay.from_storage(data.get("fields")), data.get(VERSION_FIELD, 0)
+
+
+def shard_delta(bank, sheet, changes, version, delete_marker):
+    """Merge payload touching only the changed questions of one shard.
+
+    delete_marker is firestore.DELETE_FIELD; it is passed in so this module
+    does not depend on the Firestore client.
+    """
+    fields = {}
+    for (question_id, field), value in changes.items():
+        fields.setdefault(field, {})[str(question_id)] = delete_marker if value is None else value
+    return {"bank": bank, "sheet": sheet, "fields": fields, VERSION_FIELD: version}
+
+
+def legacy_index_from_document(document_data):
+    """(OverlayIndex, skipped keys) from a single-document layout, indexed or flat."""
+    data = dict(document_data or {})
+    data.pop(VERSION_FIELD, None)
+    if "banks" in data:
+        return OverlayIndex.from_storage(data["banks"]), []
+    return migrate_flat_overlay(data)
+
+
+# =============================
+# Local Backup
+# =============================
+def read_local_overlay(path):
+    """Read formatted_questions.json in either the indexed or the flat layout."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") == LOCAL_FORMAT:
+        return OverlayIndex.from_storage(data.get("banks"))
+    return migrate_flat_overlay(data)[0]
+
+
+def write_local_overlay(path, index):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"format": LOCAL_FORMAT, "banks": index.to_storage()}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def write_local_shard(folder, bank, sheet, sheet_overlay):
+    """Back up one shard as its own small file (removed once the shard is empty)."""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{shard_id(bank, sheet)}.json")
+    if not len(sheet_overlay):
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"bank": bank, "sheet": sheet, "fields": sheet_overlay.to_storage()}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_local_shards(folder):
+    """OverlayIndex from a folder of shard backups."""
+    index = OverlayIndex()
+    if not os.path.isdir(folder):
+        return index
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for key, field, value in SheetOverlay.from_storage(data.get("fields")).items():
+            index.set(data["bank"], data["sheet"], key, field, value)
+    return index
+
+
+class OverlayJournal:
+    """Append-only local backup of overlay edits.
+
+    Every save appends one JSON line with just the changed questions, so the
+    cost of a save does not grow with the overlay. Every compact_every
+    entries the journal is folded into the per-shard backup files and
+    truncated. Compaction first renames the journal, so lines appended by
+    other processes meanwhile land in a fresh file and are not lost.
+
+    replay() rebuilds the overlay from these files; the app serves it when
+    Firestore is unavailable.
+    """
+
+    def __init__(self, folder, compact_every=JOURNAL_COMPACT_EVERY):
+        self.folder = folder
+        self.path = os.path.join(folder, JOURNAL_FILE)
+        self.compact_every = compact_every
+        self._appended = 0
+        self._replayed = None
+        self._lock = threading.Lock()
+
+    def append(self, bank, sheet, changes):
+        entry = {
+            "ts": time.time(),
+            "bank": bank,
+            "sheet": sheet,
+            "changes": [[question_id, field, value] for (question_id, field), value in changes.items()],
+        }
+        with self._lock:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._appended += 1
+            if self._appended >= self.compact_every:
+                self._compact()
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        self._appended = 0
+        if not os.path.exists(self.path):
+            return
+        compacting = f"{self.path}.{os.getpid()}.{threading.get_ident()}.compacting"
+        os.replace(self.path, compacting)
+
+        sheets = {}
+        for bank, sheet, changes in _read_journal(compacting):
+            sheets.setdefault((bank, sheet), {}).update(changes)
+        for (bank, sheet), changes in sheets.items():
+            sheet_overlay = _read_local_shard(self.folder, bank, sheet)
+            sheet_overlay.apply(changes)
+            write_local_shard(self.folder, bank, sheet, sheet_overlay)
+        os.remove(compacting)
+
+    def replay(self):
+        """OverlayIndex from the shard backups plus any uncompacted journal entries.
+
+        The result is shared and kept until the journal or the shard files
+        change, so it must not be mutated.
+        """
+        with self._lock:
+            stamp = (_stat_stamp(self.folder), _stat_stamp(self.path))
+            if self._replayed is None or self._replayed[0] != stamp:
+                self._replayed = (stamp, self._replay())
+            return self._replayed[1]
+
+    def _replay(self):
+        index = read_local_shards(self.folder)
+        if os.path.exists(self.path):
+            for bank, sheet, changes in _read_journal(self.path):
+                for (question_id, field), value in changes.items():
+                    if value is None:
+                        index.remove(bank, sheet, question_id, field)
+                    else:
+                        index.set(bank, sheet, question_id, field, value)
+        return index
+
+
+def _stat_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_journal(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-write
+                continue
+            changes = {(question_id, field): value for question_id, field, value in entry["changes"]}
+            yield entry["bank"], entry["sheet"], changes
+
+
+def _read_local_shard(folder, bank, sheet):
+    path = os.path.join(folder, f"{shard_id(bank, sheet)}.json")
+    if not os.path.exists(path):
+        return SheetOverlay()
+    with open(path, "r", encoding="utf-8") as f:
+        return SheetOverlay.from_storage(json.load(f).get("fields"))
+
+
+# =============================
+# Shared Overlay Cache
+# =============================
+
+class OverlayCache:
+    """Process-wide cache of overlay shards with a TTL and version stamps.
+
+    load_versions() reads the small version document ({shard id: stamp}),
+    which says which shards exist and whether they changed; it is re-read
+    once the TTL expires. load_sheet(shard id) reads one shard and is only
+    called for sheets that have overrides and are missing or stale here,
+    so readers fetch just the shards they render.
+
+    Writers in this process call apply_changes() so every session sees the
+    edit at once; other processes pick it up at their next TTL check.
+
+    When on_snapshot() is registered as a listener on the shard collection
+    the cache goes live: pushed shards replace cached ones as they arrive and
+    get_sheet() reads no shards from the backend. It still re-reads the
+    version document once per TTL and, if that disagrees with what the
+    listener delivered (a closed or failed stream), falls back to TTL
+    polling. invalidate() does the same; the next snapshot goes live again.
+
+    Returned SheetOverlays are shared and never mutated once cached; updates
+    build a new overlay and swap it in under the lock. Callers must not
+    mutate them either: describe edits as {(question id, field): value}
+    changes and save those.
+    """
+
+    def __init__(self, load_sheet, load_versions, ttl_seconds=DEFAULT_OVERLAY_TTL_SECONDS):
+        self._load_sheet = load_sheet
+        self._load_versions = load_versions
+        self.ttl_seconds = ttl_seconds
+        self._sheets = {}
+        self._versions = None
+        self._checked_at = 0.0
+        self._live = False
+        self._lock = threading.Lock()
+        self.listener = None
+        self.pushed_shards = 0
+        self.shard_reads = 0
+        self.version_reads = 0
+        self.hits = 0
+
+    def get_sheet(self, bank, sheet):
+        with self._lock:
+            now = time.monotonic()
+            if self._live and now - self._checked_at >= self.ttl_seconds:
+                # A dead listener pushes nothing, so check it is still in step
+                self.version_reads += 1
+                versions = dict(self._load_versions())
+                self._checked_at = now
+                if versions != self._versions:
+                    self._versions = versions
+                    self._live = False
+
+            if self._live:
+                # Kept current by the listener, so a miss means no shard exists
+                self.hits += 1
+                cached = self._sheets.get(shard_id(bank, sheet))
+                return cached[0] if cached else EMPTY_SHEET_OVERLAY
+
+            if self._versions is None or now - self._checked_at >= self.ttl_seconds:
+                self.version_reads += 1
+                self._versions = dict(self._load_versions())
+                self._checked_at = now
+
+            sid = shard_id(bank, sheet)
+            expected = self._versions.get(sid)
+            if expected is None:
+                # No shard exists for this sheet, so there is nothing to read
+                self._sheets.pop(sid, None)
+                self.hits += 1
+                return EMPTY_SHEET_OVERLAY
+
+            cached = self._sheets.get(sid)
+            if cached is None or cached[1] != expected:
+                self.shard_reads += 1
+                cached = self._load_sheet(sid)
+                self._sheets[sid] = cached
+            else:
+                self.hits += 1
+            return cached[0]
+
+    def apply_changes(self, bank, sheet, changes, version):
+        """Apply a saved delta to a copy of the cached shard and swap it in."""
+        sid = shard_id(bank, sheet)
+        with self._lock:
+            if self._versions is None:
+                return
+            cached = self._sheets.get(sid)
+            if cached is None and sid in self._versions:
+                # Shard exists but was never read here; fetch it on next use
+                self._versions[sid] = version
+                return
+            # Other sessions may be reading the cached overlay, so never edit it in place
+            sheet_overlay = cached[0].copy() if cached else SheetOverlay()
+            sheet_overlay.apply(changes)
+            self._sheets[sid] = (sheet_overlay, version)
+            self._versions[sid] = version
+
+    def on_snapshot(self, docs, changes, read_time):
+        """Snapshot-listener callback for the shard collection."""
+        with self._lock:
+            if not self._live:
+                # First snapshot (or first since invalidate()): docs lists every shard
+                self._sheets, self._versions = {}, {}
+                self._live = True
+                for doc in docs:
+                    self._store_pushed(doc)
+            else:
+                for change in changes:
+                    if change.type.name == "REMOVED":
+                        self._sheets.pop(change.document.id, None)
+                        self._versions.pop(change.document.id, None)
+                    else:
+                        self._store_pushed(change.document)
+            self._checked_at = time.monotonic()
+
+    def _store_pushed(self, doc):
+        sheet_overlay, version = split_shard(doc.to_dict())
+        if version < self._versions.get(doc.id, 0):
+            # A newer local delta already landed here
+            return
+        self._sheets[doc.id] = (sheet_overlay, version)
+        self._versions[doc.id] = version
+        self.pushed_shards += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._sheets = {}
+            self._versions = None
+            self._live = False
+
+    def stats(self):
+        with self._lock:
+            shards, sheets = len(self._versions or {}), list(self._sheets.values())
+        return {
+            "shards": shards,
+            "cached_shards": len(sheets),
+            "entries": sum(len(overlay) for overlay, _ in sheets),
+            "shard_reads": self.shard_reads,
+            "version_reads": self.version_reads,
+            "hits": self.hits,
+            "live": self._live,
+            "pushed_shards": self.pushed_shards,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python overlay_store.py migrate-json [formatted_questions.json]
+    #       convert a flat local backup to the indexed layout in place
+    args = sys.argv[1:]
+    if args[:1] != ["migrate-json"]:
+        print(__doc__)
+        sys.exit(1)
+
+    json_path = args[1] if len(args) > 1 else "formatted_questions.json"
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") == LOCAL_FORMAT:
+        print(f"{json_path} is already migrated")
+        sys.exit(0)
+
+    index, skipped = migrate_flat_overlay(data)
+    write_local_overlay(json_path, index)
+    print(f"Migrated {len(index)} overrides from {len(data)} keys in {json_path}")
+    for key in skipped:
+        print(f"  skipped malformed key: {key}")
@@ -0,0 +1,1141 @@
+"""Compiled storage for QB.xlsx question banks.
+
+Parsing a workbook with openpyxl takes seconds for the larger banks, so each
+QB.xlsx is compiled once into per-sheet Parquet files under QB_CACHE_FOLDER.
+Compilation streams rows in fixed-size chunks through openpyxl's read-only
+mode, so memory stays flat however large the workbook is.
+The compiled artifact is keyed by the workbook's mtime/size and content hash
+and is only rebuilt when the workbook actually changes.
+
+Compiling also builds a small per-sheet catalog (question count, timing,
+marks, subjects, years) so list screens never need the question text.
+
+This module deliberately does not import streamlit so it can be used from
+command-line tools and worker processes.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+# =============================
+# Configuration
+# =============================
+QB_CACHE_FOLDER = ".qb_cache"
+QB_FILE_NAME = "QB.xlsx"
+MANIFEST_FILE = "manifest.json"
+COMPILER_VERSION = 6
+INGEST_CHUNK_ROWS = 2000  # Rows held in memory at a time while compiling
+DEFAULT_TIME_PER_QUESTION = 1.5
+
+# Columns kept from each sheet (matched as substrings of the header)
+ESSENTIAL_COLUMNS = [
+    'Question', 'Option A', 'Option B', 'Option C', 'Option D',
+    'Explanation', 'Correct Option (Final Answer Key)',
+    'Correct option (Provisional Answer Key)', 'Marks', 'Subject', 'Exam Year',
+    'Question Image'
+]
+TEXT_COLUMNS = ["Question", "Option A", "Option B", "Option C", "Option D", "Explanation"]
+# Columns stored as numbers in the compiled store (matched as substrings)
+NUMERIC_COLUMN_PATTERNS = ["Marks", "Time in Minute/Question"]
+
+# Non-text columns with at most this share of distinct values load as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Answer keys, normalized at ingestion into int8 codes (0-3 = A-D, -1 = none)
+FINAL_KEY_COLUMN = "Correct Option (Final Answer Key)"
+PROVISIONAL_KEY_COLUMN = "Correct option (Provisional Answer Key)"
+FINAL_KEY_CODE_COLUMN = "Final Key Code"
+PROVISIONAL_KEY_CODE_COLUMN = "Provisional Key Code"
+ANSWER_OPTIONS = ["A", "B", "C", "D"]
+NO_ANSWER_CODE = -1
+
+# Stable per-question ID, derived from the content at ingestion
+QUESTION_ID_COLUMN = "Question ID"
+QUESTION_ID_SOURCE_COLUMNS = ["Question", "Option A", "Option B", "Option C", "Option D"]
+
+
+# =============================
+# Sheet Preparation
+# =============================
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    mapping = {c: str(c).strip() for c in df.columns}
+    return df.rename(columns=mapping)
+
+
+def convert_google_drive_url(url):
+    """Convert any Google Drive URL to the working thumbnail format."""
+    if not url or pd.isna(url):
+        return url
+
+    url = str(url).strip()
+
+    # If it's already in the working format, keep it
+    if "lh3.googleusercontent.com/d/" in url:
+        return url
+
+    # Convert from other Google Drive formats
+    if "drive.google.com" in url:
+        # Extract file ID from: /file/d/FILE_ID/view
+        if "/file/d/" in url:
+            file_id = url.split("/file/d/")[1].split("/")[0]
+            return f"https://lh3.googleusercontent.com/d/{file_id}"
+
+    # Return unchanged if not a Google Drive URL
+    return url
+
+
+def is_essential_column(column_name):
+    """Return True if a sheet column should be kept in the question bank."""
+    return any(col in str(column_name) for col in ESSENTIAL_COLUMNS)
+
+
+def prepare_sheet(df: pd.DataFrame, seen_ids=None) -> pd.DataFrame:
+    """Clean a freshly parsed sheet into the shape the app expects.
+
+    seen_ids carries question-ID occurrence counts across chunks of one sheet.
+    """
+    df = _normalize_columns(df)
+
+    # Optional: Convert image URLs if the column exists
+    if 'Question Image' in df.columns:
+        df['Question Image'] = df['Question Image'].apply(convert_google_drive_url)
+
+    # Optimize memory usage
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            # Convert to string type for better memory usage
+            df[col] = df[col].astype('string')
+
+    # Fill NA values efficiently
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].fillna("")
+
+    df[QUESTION_ID_COLUMN] = question_ids(df, seen_ids)
+    return add_answer_key_codes(df)
+
+
+# =============================
+# Question IDs
+# =============================
+def question_ids(df, seen=None):
+    """Content-derived ID per row: a hash of the question and option text.
+
+    The ID survives reordering, sampling and retests, and stays the same when
+    only the answer key, marks or metadata change. Repeated content within a
+    sheet gets "-2", "-3", ... in sheet order. IDs start with "q" so they
+    can never be mistaken for row numbers.
+    """
+    seen = {} if seen is None else seen
+    columns = [df[col].astype(object).tolist() for col in QUESTION_ID_SOURCE_COLUMNS if col in df.columns]
+    ids = []
+    for values in zip(*columns) if columns else ([()] * len(df)):
+        text = "\x1f".join(" ".join(str(v).split()) if v is not None and not pd.isna(v) else "" for v in values)
+        digest = "q" + hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+        count = seen.get(digest, 0) + 1
+        seen[digest] = count
+        ids.append(digest if count == 1 else f"{digest}-{count}")
+    return pd.Series(ids, index=df.index, dtype="string")
+
+
+# =============================
+# Answer Keys
+# =============================
+_ANSWER_KEY_ALIASES = {
+    "A": "A", "B": "B", "C": "C", "D": "D",
+    "1": "A", "2": "B", "3": "C", "4": "D",
+    "OPTION A": "A", "OPTION B": "B", "OPTION C": "C", "OPTION D": "D",
+}
+OPTION_CODES = {letter: code for code, letter in enumerate(ANSWER_OPTIONS)}
+
+
+def answer_key_codes_from_text(values):
+    """Normalize raw answer-key cells into int8 option codes.
+
+    Accepts the same spellings as the app's per-row parser ('A', '1',
+    'Option A', 'a) ...'). Anything else becomes NO_ANSWER_CODE.
+    """
+    text = pd.Series(values, dtype="string").fillna("").str.strip().str.upper()
+    # Numeric keys read from Excel can arrive as '1.0'
+    text = text.str.replace(r"^([1-4])\.0+$", r"\1", regex=True)
+    letters = text.map(_ANSWER_KEY_ALIASES)
+    first = text.str[:1]
+    letters = letters.fillna(first.where(first.isin(ANSWER_OPTIONS)))
+    return letters.map(OPTION_CODES).fillna(NO_ANSWER_CODE).astype("int8").to_numpy()
+
+
+def add_answer_key_codes(df):
+    """Add int8 code columns for the final and provisional answer keys."""
+    for source, target in ((FINAL_KEY_COLUMN, FINAL_KEY_CODE_COLUMN),
+                           (PROVISIONAL_KEY_COLUMN, PROVISIONAL_KEY_CODE_COLUMN)):
+        if source in df.columns:
+            df[target] = answer_key_codes_from_text(df[source].to_numpy(dtype=object))
+        else:
+            df[target] = pd.Series(NO_ANSWER_CODE, index=df.index, dtype="int8")
+    return df
+
+
+def correct_option_codes(df, use_final_key=True):
+    """Correct option code per row: the final key when set, else the provisional one.
+
+    Frames built outside the compiled store (e.g. retests rebuilt from saved
+    results) have no code columns, so they are normalized here on the fly.
+    """
+    def codes(code_col, source_col):
+        if code_col in df.columns:
+            return df[code_col].to_numpy(dtype="int8")
+        if source_col in df.columns:
+            return answer_key_codes_from_text(df[source_col].to_numpy(dtype=object))
+        return np.full(len(df), NO_ANSWER_CODE, dtype="int8")
+
+    provisional = codes(PROVISIONAL_KEY_CODE_COLUMN, PROVISIONAL_KEY_COLUMN)
+    if not use_final_key:
+        return provisional
+    final = codes(FINAL_KEY_CODE_COLUMN, FINAL_KEY_COLUMN)
+    return np.where(final != NO_ANSWER_CODE, final, provisional).astype("int8")
+
+
+def option_letters(codes):
+    """Map option codes back to 'A'-'D' (None where there is no key)."""
+    letters = np.array(ANSWER_OPTIONS + [None], dtype=object)
+    return letters[np.asarray(codes, dtype=np.int64)]
+
+
+def parse_workbook(file_path, compact=True):
+    """Parse every sheet of a workbook straight from Excel (the slow path)."""
+    df_dict = pd.read_excel(
+        file_path,
+        sheet_name=None,
+        engine="openpyxl",
+        usecols=is_essential_column
+    )
+    sheets = {sheet: prepare_sheet(df) for sheet, df in df_dict.items()}
+    if compact:
+        sheets = {sheet: compact_sheet(df) for sheet, df in sheets.items()}
+    return sheets
+
+
+# =============================
+# Compact Column Types
+# =============================
+def _compact_numeric(series):
+    """Whole-number columns (marks, keys) become the smallest int type."""
+    values = series.dropna()
+    if len(values) == len(series) and len(values) and (values % 1 == 0).all():
+        return pd.to_numeric(series, downcast="integer")
+    return series
+
+
+def compact_sheet(df):
+    """Give every column of a loaded sheet a compact dtype.
+
+    Repeated labels (subjects, years, answer keys, image URLs) become
+    categoricals, so each distinct value is stored once. Whole-number marks
+    become small ints. Free-text columns are left as strings.
+    """
+    limit = max(1, int(len(df) * CATEGORY_MAX_UNIQUE_RATIO))
+    for col in df.columns:
+        series = df[col]
+        if col in TEXT_COLUMNS or isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_float_dtype(series.dtype) or pd.api.types.is_integer_dtype(series.dtype):
+            df[col] = _compact_numeric(series)
+        elif series.nunique(dropna=True) <= limit:
+            df[col] = series.astype("category")
+    return df
+
+
+def column_memory_report(before, after):
+    """Per-column memory of a sheet before and after compact_sheet."""
+    rows = []
+    for col in after.columns:
+        before_bytes = int(before[col].memory_usage(deep=True, index=False))
+        after_bytes = int(after[col].memory_usage(deep=True, index=False))
+        rows.append({
+            "Column": col,
+            "Before dtype": str(before[col].dtype),
+            "After dtype": str(after[col].dtype),
+            "Before (KB)": round(before_bytes / 1024, 1),
+            "After (KB)": round(after_bytes / 1024, 1),
+            "Saved %": round(100 * (1 - after_bytes / before_bytes), 1) if before_bytes else 0.0,
+        })
+    return pd.DataFrame(rows)
+
+
+# =============================
+# Sheet Catalog
+# =============================
+def _first_matching_column(columns, patterns, exclude=None):
+    for col in columns:
+        name = str(col)
+        if exclude and exclude in name:
+            continue
+        if any(pattern in name for pattern in patterns):
+            return col
+    return None
+
+
+def _format_year(value):
+    text = str(value).strip()
+    try:
+        number = float(text)
+        if number.is_integer():
+            return int(number)
+    except ValueError:
+        pass
+    return text
+
+
+def _marks_text(value):
+    # Marks are stored as float64, but "1" reads better than "1.0" on cards
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class SheetCatalogBuilder:
+    """Accumulates a sheet's catalog one chunk of rows at a time.
+
+    Only small aggregates are kept (distinct subjects/years, the first
+    timing value, whether marks are uniform), so memory does not grow with
+    the number of rows.
+    """
+
+    def __init__(self):
+        self.question_count = 0
+        self.time_per_question = None
+        self._columns = None
+        self._time_found = False
+        self._marks = set()
+        self._negative = set()
+        self._subjects = set()
+        self._years = []
+        self._digest = hashlib.sha256()
+
+    def _setup(self, columns):
+        self._columns = list(columns)
+        self.subjects_column = None
+        if "Subjects Covered" in self._columns:
+            self.subjects_column = "Subjects Covered"
+        elif "Subject" in self._columns:
+            self.subjects_column = "Subject"
+        self._time_col = _first_matching_column(self._columns, ["Time in Minute/Question"])
+        self._marks_col = (
+            _first_matching_column(self._columns, ["Marks/Question", "Marks Per Question"], exclude="Negative")
+            or _first_matching_column(self._columns, ["Marks"], exclude="Negative")
+        )
+        self._negative_col = _first_matching_column(self._columns, ["Negative Marks/Question", "Negative Marks Per Question"])
+        self._digest.update("|".join(map(str, self._columns)).encode('utf-8'))
+
+    def add(self, df):
+        """Fold a chunk of prepared rows into the catalog."""
+        if self._columns is None:
+            self._setup(df.columns)
+            if self._time_col is None:
+                self._scan_time_metadata(df)
+        self.question_count += len(df)
+
+        if self._time_col is not None and not self._time_found:
+            time_values = df[self._time_col].dropna()
+            if not time_values.empty:
+                self._time_found = True
+                try:
+                    self.time_per_question = float(time_values.iloc[0])
+                except (ValueError, TypeError):
+                    self.time_per_question = None
+
+        for col, seen in ((self._marks_col, self._marks), (self._negative_col, self._negative)):
+            # Two distinct values is enough to know marks are not uniform
+            if col is not None and len(seen) < 2:
+                seen.update(_marks_text(v) for v in df[col].dropna().unique())
+
+        if self.subjects_column:
+            self._subjects.update(str(x).strip().title() for x in df[self.subjects_column].dropna())
+        if "Exam Year" in self._columns:
+            for value in df["Exam Year"].dropna():
+                year = _format_year(value)
+                if year not in self._years:
+                    self._years.append(year)
+
+        self._digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+    def _scan_time_metadata(self, df):
+        # Sometimes the timing is in a metadata row rather than a column header
+        for i in range(min(5, len(df))):
+            for cell_value in df.iloc[i]:
+                if isinstance(cell_value, str) and "Time in Minute/Question" in cell_value:
+                    match = re.search(r'[\d.]+', cell_value)
+                    if match:
+                        try:
+                            self.time_per_question = float(match.group())
+                            return
+                        except ValueError:
+                            pass
+
+    def result(self):
+        numeric_years = [y for y in self._years if isinstance(y, int)]
+        string_years = [y for y in self._years if isinstance(y, str)]
+        return {
+            "question_count": int(self.question_count),
+            "time_per_question": self.time_per_question,
+            "marks_per_question": next(iter(self._marks)) if len(self._marks) == 1 else None,
+            "negative_marks_per_question": next(iter(self._negative)) if len(self._negative) == 1 else None,
+            "subjects_column": getattr(self, "subjects_column", None),
+            "subjects": sorted(self._subjects),
+            # Numeric years newest first, followed by any free-text values
+            "years": sorted(numeric_years, reverse=True) + sorted(string_years),
+            "content_hash": self._digest.hexdigest(),
+        }
+
+
+def build_sheet_catalog(df):
+    """Summarize a whole sheet for the folder and exam-config screens."""
+    builder = SheetCatalogBuilder()
+    builder.add(df)
+    return builder.result()
+
+
+def catalog_duration_minutes(catalog):
+    """Default exam duration for a sheet, derived from its catalog entry."""
+    time_per_question = catalog.get("time_per_question") or DEFAULT_TIME_PER_QUESTION
+    return int(catalog["question_count"] * time_per_question)
+
+
+# =============================
+# Compiled Artifacts
+# =============================
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_artifact_dir(file_path):
+    """Directory holding the compiled artifact for a workbook."""
+    path_key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(QB_CACHE_FOLDER, path_key)
+
+
+def read_manifest(file_path):
+    """Load the manifest of a compiled workbook, or None if there is none."""
+    manifest_path = os.path.join(get_artifact_dir(file_path), MANIFEST_FILE)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(file_path, manifest):
+    artifact_dir = get_artifact_dir(file_path)
+    tmp_path = os.path.join(artifact_dir, f"{MANIFEST_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(artifact_dir, MANIFEST_FILE))
+
+
+def is_artifact_fresh(file_path, manifest):
+    """Check whether a compiled artifact still matches its workbook.
+
+    mtime and size are compared first; only when they differ is the content
+    hash computed, so touching a workbook without editing it does not force a
+    recompile.
+    """
+    if not manifest or manifest.get("compiler_version") != COMPILER_VERSION:
+        return False
+
+    stat = os.stat(file_path)
+    if manifest.get("source_mtime") == stat.st_mtime and manifest.get("source_size") == stat.st_size:
+        return True
+
+    if file_content_hash(file_path) != manifest.get("content_hash"):
+        return False
+
+    # Same bytes, new mtime - remember it so the hash isn't recomputed next time
+    manifest["source_mtime"] = stat.st_mtime
+    manifest["source_size"] = stat.st_size
+    _write_manifest(file_path, manifest)
+    return True
+
+
+# =============================
+# Streaming Ingestion
+# =============================
+def _header_names(header_row):
+    """Column names for a header row, mangled like pandas ('Name', 'Name.1')."""
+    names = []
+    seen = {}
+    for idx, value in enumerate(header_row):
+        name = str(value).strip() if value is not None else f"Unnamed: {idx}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def is_numeric_column(column_name):
+    return any(pattern in str(column_name) for pattern in NUMERIC_COLUMN_PATTERNS)
+
+
+def _chunk_frame(columns, rows, seen_ids=None):
+    """Build a prepared DataFrame chunk with a fixed dtype per column."""
+    data = {}
+    for col_idx, col in enumerate(columns):
+        values = [row[col_idx] for row in rows]
+        if is_numeric_column(col):
+            data[col] = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").astype("float64")
+        else:
+            data[col] = pd.Series([str(v) if v is not None else None for v in values], dtype=object)
+    return prepare_sheet(pd.DataFrame(data, columns=columns), seen_ids)
+
+
+def _chunk_schema(columns):
+    return pa.schema([
+        (col, pa.float64() if is_numeric_column(col) else pa.string())
+        for col in columns
+    ] + [
+        (QUESTION_ID_COLUMN, pa.string()),
+        (FINAL_KEY_CODE_COLUMN, pa.int8()),
+        (PROVISIONAL_KEY_CODE_COLUMN, pa.int8()),
+    ])
+
+
+def stream_sheet_to_parquet(worksheet, out_path, chunk_rows=INGEST_CHUNK_ROWS):
+    """Stream one read-only worksheet into a Parquet file, chunk by chunk.
+
+    At most chunk_rows rows are held in memory at a time; each chunk becomes
+    one Parquet row group. Returns (row count, catalog).
+    """
+    rows_iter = worksheet.iter_rows(values_only=True)
+    header = next(rows_iter, None) or ()
+    names = _header_names(header)
+    keep = [idx for idx, name in enumerate(names) if is_essential_column(name)]
+    columns = [names[idx] for idx in keep]
+    schema = _chunk_schema(columns)
+    catalog = SheetCatalogBuilder()
+    seen_ids = {}
+
+    writer = None
+
+    def write_chunk(chunk):
+        nonlocal writer
+        df = _chunk_frame(columns, chunk, seen_ids)
+        catalog.add(df)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if writer is None:
+            # Open with the first table's schema so the pandas dtypes round-trip
+            writer = pq.ParquetWriter(out_path, table.schema)
+        writer.write_table(table)
+
+    try:
+        chunk = []
+        blank_rows = 0
+        for row in rows_iter:
+            # Keep interior blank rows so row numbers match pd.read_excel; drop trailing ones, as it does
+            if row is None or all(cell is None or (isinstance(cell, str) and not cell.strip()) for cell in row):
+                blank_rows += 1
+                continue
+            pending = [(None,) * len(keep)] * blank_rows + [tuple(row[idx] if idx < len(row) else None for idx in keep)]
+            blank_rows = 0
+            for values in pending:
+                chunk.append(values)
+                if len(chunk) >= chunk_rows:
+                    write_chunk(chunk)
+                    chunk = []
+        if chunk or writer is None:
+            write_chunk(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return catalog.question_count, catalog.result()
+
+
+def compile_question_bank(file_path, chunk_rows=INGEST_CHUNK_ROWS):
+    """Stream a QB.xlsx into per-sheet Parquet files.
+
+    Uses openpyxl's read-only mode so peak memory stays flat regardless of
+    workbook size. Returns the new manifest.
+    """
+    stat = os.stat(file_path)
+    content_hash = file_content_hash(file_path)
+
+    artifact_dir = get_artifact_dir(file_path)
+    tmp_dir = f"{artifact_dir}.building.{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    started = time.perf_counter()
+    sheet_entries = []
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for idx, worksheet in enumerate(workbook.worksheets):
+            sheet_file = f"sheet_{idx}.parquet"
+            rows, catalog = stream_sheet_to_parquet(worksheet, os.path.join(tmp_dir, sheet_file), chunk_rows)
+            sheet_entries.append({
+                "name": worksheet.title,
+                "file": sheet_file,
+                "rows": int(rows),
+                "catalog": catalog,
+                "warm_load_seconds": None,
+            })
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    finally:
+        workbook.close()
+    cold_seconds = time.perf_counter() - started
+
+    manifest = {
+        "compiler_version": COMPILER_VERSION,
+        "source_path": file_path,
+        "source_mtime": stat.st_mtime,
+        "source_size": stat.st_size,
+        "content_hash": content_hash,
+        "compiled_at": time.time(),
+        "sheets": sheet_entries,
+        "cold_load_seconds": round(cold_seconds, 4),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    # Swap the finished artifact into place
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    os.replace(tmp_dir, artifact_dir)
+    return manifest
+
+
+class QuestionBank(Mapping):
+    """A question bank whose sheets are loaded on first use.
+
+    Sheet names and the per-sheet catalog are available up front from the
+    manifest; bank[sheet] reads that sheet's Parquet file the first time it
+    is requested and keeps it for later calls. Banks holding dozens of
+    previous-year papers therefore only pay for the paper actually opened.
+    """
+
+    def __init__(self, file_path, manifest=None, sheets=None):
+        self.file_path = file_path
+        self._manifest = manifest
+        self._entries = {entry["name"]: entry for entry in manifest["sheets"]} if manifest else {}
+        self._sheets = dict(sheets or {})
+        self._sheet_bytes = {name: int(df.memory_usage(deep=True).sum()) for name, df in self._sheets.items()}
+        self._lock = threading.Lock()
+
+        if sheets is not None and manifest is None:
+            self.catalog = {name: build_sheet_catalog(df) for name, df in self._sheets.items()}
+        else:
+            self.catalog = {name: entry["catalog"] for name, entry in self._entries.items()}
+
+    def __getitem__(self, sheet_name):
+        df = self._sheets.get(sheet_name)
+        if df is not None:
+            return df
+        if sheet_name not in self._entries:
+            raise KeyError(sheet_name)
+
+        with self._lock:
+            if sheet_name not in self._sheets:
+                self._sheets[sheet_name] = self._load_sheet(sheet_name)
+            return self._sheets[sheet_name]
+
+    def __iter__(self):
+        return iter(self.catalog)
+
+    def __len__(self):
+        return len(self.catalog)
+
+    @property
+    def nbytes(self):
+        """Memory held by the sheets loaded so far."""
+        return sum(self._sheet_bytes.values())
+
+    def _read_sheet(self, sheet_name):
+        """The sheet exactly as stored in the compiled artifact."""
+        entry = self._entries[sheet_name]
+        return pd.read_parquet(os.path.join(get_artifact_dir(self.file_path), entry["file"]))
+
+    def _load_sheet(self, sheet_name):
+        entry = self._entries[sheet_name]
+        started = time.perf_counter()
+        df = compact_sheet(self._read_sheet(sheet_name))
+        entry["warm_load_seconds"] = round(time.perf_counter() - started, 4)
+        self._sheet_bytes[sheet_name] = int(df.memory_usage(deep=True).sum())
+
+        # Record the warm timing for the cold-vs-warm report
+        try:
+            _write_manifest(self.file_path, self._manifest)
+        except OSError:
+            pass
+        return df
+
+
+def _fresh_manifest(file_path):
+    manifest = read_manifest(file_path)
+    if not is_artifact_fresh(file_path, manifest):
+        manifest = compile_question_bank(file_path)
+    return manifest
+
+
+def load_compiled_bank(file_path):
+    """Open a question bank, compiling it first if the artifact is stale.
+
+    Only the manifest is read here; sheets load lazily. Falls back to parsing
+    the workbook directly when Parquet support is not installed.
+    """
+    if not PARQUET_AVAILABLE:
+        return QuestionBank(file_path, sheets=parse_workbook(file_path))
+    return QuestionBank(file_path, manifest=_fresh_manifest(file_path))
+
+
+def bank_memory_report(file_path):
+    """Return {sheet name: column_memory_report} for one question bank."""
+    if not PARQUET_AVAILABLE:
+        raw_sheets = parse_workbook(file_path, compact=False)
+    else:
+        bank = QuestionBank(file_path, manifest=_fresh_manifest(file_path))
+        raw_sheets = {sheet: bank._read_sheet(sheet) for sheet in bank}
+    return {
+        sheet: column_memory_report(raw, compact_sheet(raw.copy()))
+        for sheet, raw in raw_sheets.items()
+    }
+
+
+def get_load_timings():
+    """Cold (Excel) vs warm (compiled) load times for every compiled bank."""
+    timings = []
+    if not os.path.isdir(QB_CACHE_FOLDER):
+        return timings
+
+    for entry in sorted(os.listdir(QB_CACHE_FOLDER)):
+        manifest_path = os.path.join(QB_CACHE_FOLDER, entry, MANIFEST_FILE)
+        if not os.path.isfile(manifest_path):
+            continue
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        cold = manifest.get("cold_load_seconds")
+        sheet_timings = [s["warm_load_seconds"] for s in manifest.get("sheets", []) if s.get("warm_load_seconds") is not None]
+        warm = round(sum(sheet_timings), 4) if len(sheet_timings) == len(manifest.get("sheets", [])) else None
+        timings.append({
+            "bank": manifest.get("source_path", entry),
+            "sheets": len(manifest.get("sheets", [])),
+            "rows": sum(s.get("rows", 0) for s in manifest.get("sheets", [])),
+            "cold_seconds": cold,
+            "warm_seconds": warm,
+            "speedup": round(cold / warm, 1) if cold and warm else None,
+        })
+    return timings
+
+
+# =============================
+# Shared In-Memory Cache
+# =============================
+def bank_nbytes(bank):
+    """Approximate in-memory size of a loaded bank."""
+    if isinstance(bank, QuestionBank):
+        return bank.nbytes
+    return int(sum(df.memory_usage(deep=True).sum() for df in bank.values()))
+
+
+class QuestionBankCache:
+    """Process-wide LRU of loaded banks, bounded by total byte size.
+
+    Entries are keyed by (absolute path, mtime) so an edited workbook gets a
+    fresh entry and the stale one is dropped. Every caller receives the same
+    bank object; callers must treat the DataFrames as read-only.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (path, mtime) -> bank
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path, loader):
+        """Return the cached bank for file_path, loading it with loader() on a miss."""
+        path = os.path.abspath(file_path)
+        key = (path, os.path.getmtime(file_path))
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Lazily loaded sheets grow a bank after insertion
+                self._evict()
+                return self._entries[key]
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        # One loader per path; concurrent sessions wait and reuse its result
+        with load_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+
+            bank = loader(file_path)
+            if not bank:
+                return bank
+
+            with self._lock:
+                for stale_key in [k for k in self._entries if k[0] == path]:
+                    del self._entries[stale_key]
+                self._entries[key] = bank
+                self._evict()
+            return bank
+
+    def invalidate(self, file_path=None):
+        """Drop one bank (or everything) from the cache."""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(file_path)
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it alone is too big
+        while len(self._entries) > 1 and self.total_bytes > self.max_bytes:
+            self._entries.popitem(last=False)
+
+    @property
+    def total_bytes(self):
+        return sum(bank_nbytes(bank) for bank in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "banks": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def find_question_banks(root):
+    """Return the paths of every QB.xlsx below root."""
+    banks = []
+    for dirpath, _dirs, files in os.walk(root):
+        if QB_FILE_NAME in files:
+            banks.append(os.path.join(dirpath, QB_FILE_NAME))
+    return sorted(banks)
+
+
+# =============================
+# Shared Folder Index
+# =============================
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class FolderIndex:
+    """Incrementally maintained view of the question folder tree.
+
+    The tree has the same shape scan_folder_structure always produced:
+    nested dicts of sub-folders plus a '_files' list per folder. refresh()
+    polls folder and QB.xlsx mtimes and rescans only the folders whose
+    mtime moved, so adding or removing a bank touches just that subtree.
+    Updates build a new tree (copying only the changed path) and swap it
+    in, so readers iterating an older tree are never disturbed.
+    """
+
+    def __init__(self, root, poll_seconds=10):
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self.version = 0
+        self._lock = threading.Lock()
+        self._dir_mtimes = {}   # relative folder path ('' = root) -> mtime
+        self._bank_mtimes = {}  # QB.xlsx path -> mtime
+        self._last_poll = time.monotonic()
+        self.structure = self._scan_tree("", {"added": [], "removed": [], "changed": []}) if os.path.isdir(root) else {}
+
+    @property
+    def banks(self):
+        return sorted(self._bank_mtimes)
+
+    def refresh(self, force=False):
+        """Apply folder changes since the last poll.
+
+        Returns {'added', 'removed', 'changed'} lists of bank paths, or None
+        when the poll interval has not elapsed or another caller is polling.
+        """
+        if not force and time.monotonic() - self._last_poll < self.poll_seconds:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self._last_poll = time.monotonic()
+            changes = {"added": [], "removed": [], "changed": []}
+            structure = self.structure
+
+            if not os.path.isdir(self.root):
+                changes["removed"].extend(self._forget(""))
+                self.structure = {}
+                return changes
+
+            if not structure:
+                structure = self._scan_tree("", changes)
+            else:
+                # Shallowest first; a parent rescan drops removed children from _dir_mtimes
+                moved = [rel for rel, mtime in self._dir_mtimes.items() if _mtime(self._abs(rel)) != mtime]
+                for rel in sorted(moved, key=lambda r: (r.count(os.sep), r)):
+                    if rel in self._dir_mtimes and os.path.isdir(self._abs(rel)):
+                        structure = self._rescan_dir(structure, rel, changes)
+
+            # Edits inside a workbook don't touch its folder's mtime
+            for bank, mtime in list(self._bank_mtimes.items()):
+                current = _mtime(bank)
+                if current is not None and current != mtime:
+                    self._bank_mtimes[bank] = current
+                    changes["changed"].append(bank)
+
+            if structure is not self.structure:
+                self.structure = structure
+            if any(changes.values()):
+                self.version += 1
+            return changes
+        finally:
+            self._lock.release()
+
+    def _abs(self, rel):
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def _scan_tree(self, rel, changes):
+        """Build the node for rel and everything below it."""
+        node = {}
+        abs_dir = self._abs(rel)
+        self._dir_mtimes[rel] = _mtime(abs_dir)
+        files = []
+        for entry in os.scandir(abs_dir):
+            if entry.is_dir():
+                node[entry.name] = self._scan_tree(os.path.join(rel, entry.name), changes)
+            else:
+                files.append(entry.name)
+        node['_files'] = files
+        if QB_FILE_NAME in files:
+            bank = os.path.join(abs_dir, QB_FILE_NAME)
+            self._bank_mtimes[bank] = _mtime(bank)
+            changes["added"].append(bank)
+        return node
+
+    def _forget(self, rel):
+        """Drop bookkeeping for rel and its subtree; return the banks removed."""
+        prefix = rel + os.sep if rel else ""
+        for key in [k for k in self._dir_mtimes if k == rel or k.startswith(prefix)]:
+            del self._dir_mtimes[key]
+        abs_prefix = self._abs(rel) + os.sep
+        removed = [bank for bank in self._bank_mtimes if bank.startswith(abs_prefix)]
+        for bank in removed:
+            del self._bank_mtimes[bank]
+        return removed
+
+    def _rescan_dir(self, structure, rel, changes):
+        """Return a new tree with only the folder at rel re-listed."""
+        parts = rel.split(os.sep) if rel else []
+        old_node = structure
+        for part in parts:
+            old_node = old_node.get(part, {})
+
+        abs_dir = self._abs(rel)
+        self._dir_mtimes[rel] = _mtime(abs_dir)
+        new_node = {}
+        files = []
+        for entry in os.scandir(abs_dir):
+            if entry.is_dir():
+                child_rel = os.path.join(rel, entry.name)
+                if entry.name in old_node and entry.name != '_files':
+                    new_node[entry.name] = old_node[entry.name]  # untouched subtree
+                else:
+                    new_node[entry.name] = self._scan_tree(child_rel, changes)
+            else:
+                files.append(entry.name)
+        new_node['_files'] = files
+
+        for name in old_node:
+            if name != '_files' and name not in new_node:
+                changes["removed"].extend(self._forget(os.path.join(rel, name)))
+
+        bank = os.path.join(abs_dir, QB_FILE_NAME)
+        if QB_FILE_NAME in files and bank not in self._bank_mtimes:
+            self._bank_mtimes[bank] = _mtime(bank)
+            changes["added"].append(bank)
+        elif QB_FILE_NAME not in files and bank in self._bank_mtimes:
+            del self._bank_mtimes[bank]
+            changes["removed"].append(bank)
+
+        # Copy only the path from the root down to the changed folder
+        if not parts:
+            return new_node
+        new_root = dict(structure)
+        level = new_root
+        for part in parts[:-1]:
+            level[part] = dict(level[part])
+            level = level[part]
+        level[parts[-1]] = new_node
+        return new_root
+
+
+# =============================
+# Startup Prewarm
+# =============================
+def _prewarm_one(file_path):
+    """Compile one bank if needed; runs inside a worker process."""
+    started = time.perf_counter()
+    compiled = False
+    if not is_artifact_fresh(file_path, read_manifest(file_path)):
+        compile_question_bank(file_path)
+        compiled = True
+    return {
+        "path": file_path,
+        "ok": True,
+        "compiled": compiled,
+        "seconds": round(time.perf_counter() - started, 4),
+        "error": None,
+    }
+
+
+def _prewarm_failure(file_path, error):
+    return {"path": file_path, "ok": False, "compiled": False, "seconds": None, "error": error}
+
+
+def _run_prewarm_pool(paths, workers, report):
+    """Compile paths in one worker pool, passing each result to report.
+
+    Returns the paths left unfinished because a worker process died and
+    broke the pool.
+    """
+    broken = []
+    # spawn: never fork a multithreaded server process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_prewarm_one, path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                broken.append(futures[future])
+                continue
+            except Exception as e:
+                result = _prewarm_failure(futures[future], str(e))
+            report(result)
+    return broken
+
+
+def prewarm_question_banks(root, max_workers=None, progress=None):
+    """Compile every QB.xlsx under root in parallel worker processes.
+
+    progress(done, total, result) is called as each bank finishes. A bank
+    that fails to compile is reported with ok=False and does not stop the
+    others; if a worker process crashes, the banks it took down with the
+    pool are retried one at a time so only the culprit fails. Returns one
+    result dict per bank.
+    """
+    banks = find_question_banks(root)
+    if not banks or not PARQUET_AVAILABLE:
+        return []
+
+    results = []
+
+    def report(result):
+        results.append(result)
+        if progress:
+            progress(len(results), len(banks), result)
+
+    workers = max_workers or min(len(banks), os.cpu_count() or 1)
+    for path in _run_prewarm_pool(banks, workers, report):
+        if _run_prewarm_pool([path], 1, report):
+            report(_prewarm_failure(path, "worker process crashed while compiling"))
+    return results
+
+
+def compiled_bank_status(root):
+    """[(path, fresh)] for every bank under root, checked against the manifests without compiling."""
+    return [(path, is_artifact_fresh(path, read_manifest(path))) for path in find_question_banks(root)]
+
+
+def print_prewarm_progress(done, total, result):
+    """Progress callback for prewarm_question_banks that logs to stdout."""
+    if result["ok"]:
+        action = "compiled" if result["compiled"] else "up to date"
+        print(f"[{done}/{total}] {result['path']} - {action} in {result['seconds']:.3f}s")
+    else:
+        print(f"[{done}/{total}] {result['path']} - FAILED: {result['error']}")
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python question_bank_store.py prewarm [folder]         compile every bank in parallel
+    #   python question_bank_store.py memory [QB.xlsx or folder ...]  per-column memory report
+    #   python question_bank_store.py [QB.xlsx or folder ...]  cold vs warm load report
+    args = sys.argv[1:]
+    if args[:1] == ["prewarm"]:
+        root = args[1] if len(args) > 1 else "Question_Data_Folder"
+        results = prewarm_question_banks(root, progress=print_prewarm_progress)
+        failed = [r for r in results if not r["ok"]]
+        print(f"Prewarmed {len(results) - len(failed)}/{len(results)} question banks")
+        sys.exit(1 if failed else 0)
+
+    report_memory = args[:1] == ["memory"]
+    if report_memory:
+        args = args[1:]
+
+    paths = []
+    for target in args or ["Question_Data_Folder"]:
+        paths.extend(find_question_banks(target) if os.path.isdir(target) else [target])
+
+    if report_memory:
+        for path in paths:
+            for sheet_name, report in bank_memory_report(path).items():
+                before, after = report["Before (KB)"].sum(), report["After (KB)"].sum()
+                print(f"\n{path} :: {sheet_name}  {before:.1f} KB -> {after:.1f} KB")
+                print(report.to_string(index=False))
+        sys.exit(0)
+
+    print(f"{'Bank':<70} {'Cold (s)':>10} {'Warm (s)':>10}")
+    for path in paths:
+        manifest = compile_question_bank(path)
+        bank = load_compiled_bank(path)
+        for sheet_name in bank:
+            bank[sheet_name]
+        manifest = read_manifest(path)
+        warm = sum(entry["warm_load_seconds"] for entry in manifest["sheets"])
+        print(f"{path:<70} {manifest['cold_load_seconds']:>10.3f} {warm:>10.3f}")
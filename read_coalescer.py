@@ -0,0 +1,136 @@
+"""Per-run memoization and cross-session coalescing of backend reads.
+
+A Streamlit script run calls the same loaders (user documents, the user
+list, profiles, login sheets) from several places. RunReads remembers
+each result for the rest of one run, keyed by a hashable request key, so
+every read reaches the backend at most once per run. SingleFlight is
+shared by all sessions in the process: when two runs ask for the same key
+at the same time, only one of them calls the loader and the other waits
+for its result. A session that has just written calls forget() so later
+callers start a new load instead of joining one that began before the
+write.
+
+Neither class imports streamlit; the app keeps one SingleFlight per
+process and starts a new RunReads at the top of every run.
+"""
+import copy
+import threading
+
+
+# =============================
+# Cross-Session Coalescing
+# =============================
+class _Call:
+    def __init__(self, generation):
+        self.generation = generation
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one loader per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._forgotten = {}  # key prefix -> generation of the last write
+        self.generation = 0
+        self.loads = 0
+        self.shared = 0
+
+    def do(self, key, loader):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or self._is_stale(key, call)
+            if leader:
+                call = self._calls[key] = _Call(self.generation)
+                self.loads += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = loader()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Only in-flight calls are shared; the next caller loads afresh
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                if not self._calls:
+                    # Staleness only matters for loads still in flight
+                    self._forgotten.clear()
+            call.done.set()
+
+    def forget(self, prefix):
+        """Stop sharing in-flight loads whose key starts with prefix (after a write)."""
+        with self._lock:
+            self.generation += 1
+            self._forgotten[prefix] = self.generation
+
+    def _is_stale(self, key, call):
+        return any(
+            generation > call.generation
+            for prefix, generation in self._forgotten.items()
+            if key[:len(prefix)] == prefix
+        )
+
+    def stats(self):
+        return {"loads": self.loads, "shared": self.shared, "in_flight": len(self._calls),
+                "generation": self.generation}
+
+
+# =============================
+# Per-Run Memo
+# =============================
+class RunReads:
+    """Results of the reads made during one script run.
+
+    Keys are tuples whose first item names the kind of read, e.g.
+    ("user", username); invalidate(kind, ...) drops matching entries after
+    a write, and stops other sessions' older in-flight loads from being
+    shared, so the rest of the run sees the new data. A loader's exception
+    is remembered like a result and raised to every caller, which can then
+    report it in its own session. get() returns a deep copy, so callers may
+    modify what they receive.
+    """
+
+    def __init__(self, flight=None):
+        self._flight = flight
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        if key in self._results:
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                self._results[key] = (self._flight.do(key, loader) if self._flight else loader(), None)
+            except Exception as e:
+                self._results[key] = (None, e)
+        result, error = self._results[key]
+        if error is not None:
+            raise error
+        return copy.deepcopy(result)
+
+    def invalidate(self, kind, *args):
+        """Forget results whose key starts with (kind, *args)."""
+        prefix = (kind,) + args
+        for key in [key for key in self._results if key[:len(prefix)] == prefix]:
+            del self._results[key]
+        if self._flight is not None:
+            self._flight.forget(prefix)
+
+    def stats(self):
+        return {"entries": len(self._results), "hits": self.hits, "misses": self.misses}
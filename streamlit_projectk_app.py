@@ -7,7 +7,6 @@ from pathlib import Path
 import json
 from streamlit_autorefresh import st_autorefresh
 import psutil
-from functools import lru_cache
 import streamlit.components.v1 as components
 import firebase_admin
 from firebase_admin import credentials, firestore
@@ -15,6 +14,20 @@ import json
 from datetime import datetime
 import pytz
 import re
+from functools import lru_cache
+import nh3
+from question_bank_store import (
+    DEFAULT_TIME_PER_QUESTION, NO_ANSWER_CODE, OPTION_CODES, QUESTION_ID_COLUMN, FolderIndex, QuestionBankCache,
+    bank_memory_report, catalog_duration_minutes, compiled_bank_status, correct_option_codes, get_load_timings,
+    load_compiled_bank, option_letters, prewarm_question_banks, print_prewarm_progress
+)
+from overlay_store import (
+    EMPTY_SHEET_OVERLAY, KEYED_BY_FIELD, KEYED_BY_QUESTION_ID, LEGACY_OVERLAY_DOCUMENTS, OVERLAY_COLLECTION,
+    OVERLAY_FIELDS, SHARD_COLLECTION, SHARD_WRITE_BATCH, SHARDS_DOCUMENT, VERSION_DOCUMENT, OverlayCache,
+    OverlayIndex, OverlayJournal, compact_sheet_overlay, legacy_index_from_document, new_version_stamp,
+    read_local_overlay, rekey_rows, shard_delta, shard_document, shard_id, split_shard, write_local_shard
+)
+from read_coalescer import RunReads, SingleFlight
 
 
 # =============================
@@ -24,7 +37,11 @@ QUESTION_DATA_FOLDER = "Question_Data_Folder"
 LOGIN_FILE_PATH = "login/admin_login_details.xlsx"  # Keep for backward compatibility
 EDITOR_LOGIN_FILE_PATH = "login/editor_login_details.xlsx"  # Add this line
 USER_PROGRESS_FOLDER = "user_progress"
-FORMATTED_QUESTIONS_FILE = "formatted_questions.json"
+FORMATTED_QUESTIONS_FILE = "formatted_questions.json"  # Pre-sharding backup, read once to migrate
+FORMATTED_QUESTIONS_BACKUP_FOLDER = "formatted_questions_backup"  # Per-shard JSON files plus an edit journal
+# Where each quiz question came from; with QUESTION_ID_COLUMN this resolves overlays and retests
+SOURCE_BANK_COLUMN = "Bank Path"
+SOURCE_SHEET_COLUMN = "Sheet Name"
 
 # Admin users will be loaded from Excel file, not hardcoded
 ADMIN_USERS = []  # Will be populated from Excel file
@@ -37,6 +54,13 @@ class PerformanceConfig:
     MAX_MEMORY_MB = 500
     CLEANUP_INTERVAL_MINUTES = 5
     MAX_QUESTIONS_PER_LOAD = 200
+    QB_CACHE_MAX_MB = 256  # Shared question-bank cache (all sessions)
+    FOLDER_INDEX_POLL_SECONDS = 10  # How often the shared folder index checks for new banks
+    PREWARM_WORKERS = 4  # Processes used to compile banks at server start
+    OVERLAY_CACHE_TTL_SECONDS = 30  # Version-check interval when the overlay listener is not running
+    RENDER_CACHE_SIZE = 8192  # Rendered question/option/explanation fragments kept per process
+    BULK_EDIT_PAGE_SIZE = 100  # Questions shown at once in the bulk overlay editor
+    HISTORY_PAGE_SIZE = 10  # Test attempts fetched per "load more" on the dashboard
 
 # =============================
 # Firebase Configuration
@@ -679,6 +703,44 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
+# =============================
+# Per-Run Reads
+# =============================
+@st.cache_resource
+def get_read_flight():
+    """Coalesces identical in-flight reads across every session in this process."""
+    return SingleFlight()
+
+def begin_run_reads():
+    """Start a fresh read memo; called at the top of every script run."""
+    st.session_state.run_reads = RunReads(get_read_flight())
+    return st.session_state.run_reads
+
+def run_read(key, loader):
+    """Result of loader(), read from the backend at most once per script run.
+
+    loader may run on behalf of several sessions, so it must raise on failure
+    rather than call st.error; each caller reports the error itself.
+    """
+    reads = st.session_state.get("run_reads") or begin_run_reads()
+    return reads.get(key, loader)
+
+def invalidate_run_reads(kind, *args):
+    """Forget memoized reads after a write, e.g. invalidate_run_reads("user", username)."""
+    reads = st.session_state.get("run_reads")
+    if reads is not None:
+        reads.invalidate(kind, *args)
+    else:
+        get_read_flight().forget((kind,) + args)
+
+def _read_user_doc(username):
+    doc = db.collection('users').document(username).get()
+    return doc.to_dict() if doc.exists else None
+
+def get_user_doc(username):
+    """users/<username> as a dict (None if missing), read once per script run."""
+    return run_read(("user", username), lambda: _read_user_doc(username))
+
 # =============================
 # Firebase User Management Functions
 # =============================
@@ -731,6 +793,8 @@ def register_user(full_name, email, phone, username, password):
         }
         
         users_ref.document(username).set(user_data)
+        invalidate_run_reads("user", username)
+        invalidate_run_reads("users")
         
         initialize_user_progress(username)
         
@@ -773,14 +837,11 @@ def authenticate_user_firebase(username, password):
             return False, "System error"
         
         # Get user document
-        user_ref = db.collection('users').document(username)
-        user_doc = user_ref.get()
+        user_data = get_user_doc(username)
         
-        if not user_doc.exists:
+        if user_data is None:
             return False, "Invalid username or password"
         
-        user_data = user_doc.to_dict()
-        
         # Check if user is approved
         if not user_data.get('is_approved', False):
             return False, "Account pending admin approval"
@@ -792,7 +853,9 @@ def authenticate_user_firebase(username, password):
         # Check password
         if user_data.get('password') == password:
             # Update last login
-            user_ref.update({"last_login": now_ist().isoformat()})
+            db.collection('users').document(username).update({"last_login": now_ist().isoformat()})
+            invalidate_run_reads("user", username)
+            invalidate_run_reads("users")
             return True, "success"
         else:
             return False, "Invalid password"
@@ -807,16 +870,13 @@ def get_all_users():
         if db is None:
             return []
         
-        users_ref = db.collection('users')
-        docs = users_ref.stream()
+        docs = run_read(("users",), lambda: [(doc.id, doc.to_dict()) for doc in db.collection('users').stream()])
         
         users = []
         admin_credentials = load_admin_credentials()
         editor_credentials = load_editor_credentials()
         
-        for doc in docs:
-            user_data = doc.to_dict()
-            username = doc.id
+        for username, user_data in docs:
             
             # Determine user type/role
             if username in admin_credentials:
@@ -859,6 +919,8 @@ def update_user_status(username, is_active):
             "is_active": is_active,
             "updated_at": now_ist().isoformat()
         })
+        invalidate_run_reads("user", username)
+        invalidate_run_reads("users")
         return True
     except Exception as e:
         st.error(f"Error updating user: {e}")
@@ -876,6 +938,9 @@ def delete_user(username):
         user_doc = db.collection("users").document(username)
         if user_doc.get().exists:
             user_doc.delete()
+        invalidate_run_reads("user", username)
+        invalidate_run_reads("users")
+        invalidate_run_reads("profile", username)
 
         # --- RECURSIVELY DELETE user_progress/<username> ---
         progress_doc = db.collection("user_progress").document(username)
@@ -919,117 +984,358 @@ def update_user_approval(username, is_approved):
             "is_approved": is_approved,
             "updated_at": now_ist().isoformat()
         })
+        invalidate_run_reads("user", username)
+        invalidate_run_reads("users")
         return True
     except Exception as e:
         st.error(f"Error updating user: {e}")
         return False
 
 def load_admin_credentials():
-    """Load admin username and password from Excel file."""
+    """Load admin username and password from Excel file (read once per script run)."""
     try:
-        df = pd.read_excel(LOGIN_FILE_PATH, engine="openpyxl")
-        df.columns = [str(col).strip().lower() for col in df.columns]
-        
-        if "username" not in df.columns or "password" not in df.columns:
-            st.error("Login file must contain 'Username' and 'Password' columns")
-            return {}
-        
-        admin_credentials = {}
-        for _, row in df.iterrows():
-            username = str(row["username"]).strip()
-            password = str(row["password"]).strip()
-            if username and password:
-                admin_credentials[username] = password
-                
-        # Update global ADMIN_USERS list
-        global ADMIN_USERS
-        ADMIN_USERS = list(admin_credentials.keys())
-        
-        return admin_credentials
+        return run_read(("admin_credentials",), _read_admin_credentials)
     except Exception as e:
         st.error(f"Failed to load admin credentials: {e}")
         return {}
 
+def _read_admin_credentials():
+    df = pd.read_excel(LOGIN_FILE_PATH, engine="openpyxl")
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    
+    if "username" not in df.columns or "password" not in df.columns:
+        # Raised, not rendered: this may run for another session (see read_coalescer)
+        raise ValueError("Login file must contain 'Username' and 'Password' columns")
+    
+    admin_credentials = {}
+    for _, row in df.iterrows():
+        username = str(row["username"]).strip()
+        password = str(row["password"]).strip()
+        if username and password:
+            admin_credentials[username] = password
+            
+    # Update global ADMIN_USERS list
+    global ADMIN_USERS
+    ADMIN_USERS = list(admin_credentials.keys())
+    
+    return admin_credentials
+
 # Add this new function for editor credentials
 def load_editor_credentials():
-    """Load editor username and password from Excel file."""
+    """Load editor username and password from Excel file (read once per script run)."""
     try:
-        if not os.path.exists(EDITOR_LOGIN_FILE_PATH):
-            st.error(f"Editor login file not found at {EDITOR_LOGIN_FILE_PATH}")
-            return {}
-            
-        df = pd.read_excel(EDITOR_LOGIN_FILE_PATH, engine="openpyxl")
-        df.columns = [str(col).strip().lower() for col in df.columns]
-        
-        if "username" not in df.columns or "password" not in df.columns:
-            st.error("Editor login file must contain 'Username' and 'Password' columns")
-            return {}
-        
-        editor_credentials = {}
-        for _, row in df.iterrows():
-            username = str(row["username"]).strip()
-            password = str(row["password"]).strip()
-            if username and password:
-                editor_credentials[username] = password
-                
-        # Update global EDITOR_USERS list
-        global EDITOR_USERS
-        EDITOR_USERS = list(editor_credentials.keys())
-        
-        return editor_credentials
+        return run_read(("editor_credentials",), _read_editor_credentials)
     except Exception as e:
         st.error(f"Failed to load editor credentials: {e}")
         return {}
+
+def _read_editor_credentials():
+    # Raised, not rendered: this may run for another session (see read_coalescer)
+    if not os.path.exists(EDITOR_LOGIN_FILE_PATH):
+        raise FileNotFoundError(f"Editor login file not found at {EDITOR_LOGIN_FILE_PATH}")
+        
+    df = pd.read_excel(EDITOR_LOGIN_FILE_PATH, engine="openpyxl")
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    
+    if "username" not in df.columns or "password" not in df.columns:
+        raise ValueError("Editor login file must contain 'Username' and 'Password' columns")
+    
+    editor_credentials = {}
+    for _, row in df.iterrows():
+        username = str(row["username"]).strip()
+        password = str(row["password"]).strip()
+        if username and password:
+            editor_credentials[username] = password
+            
+    # Update global EDITOR_USERS list
+    global EDITOR_USERS
+    EDITOR_USERS = list(editor_credentials.keys())
+    
+    return editor_credentials
         
         
 # =============================
 # Firebase Formatted Questions Functions
 # =============================
-@lru_cache(maxsize=1)
-def load_formatted_questions_cached():
-    """Cached version of load_formatted_questions."""
-    return load_formatted_questions()
+@st.cache_resource
+def get_overlay_cache():
+    """Single formatted-question overlay cache shared by every session in this process.
 
-def load_formatted_questions():
-    """Load formatted questions from Firebase."""
+    One snapshot listener on the shard collection keeps it current, so renders
+    never read overlays from Firestore; if the listener cannot start, the cache
+    falls back to polling the version map every OVERLAY_CACHE_TTL_SECONDS.
+    """
+    cache = OverlayCache(
+        load_sheet=_read_overlay_shard,
+        load_versions=_read_overlay_versions,
+        ttl_seconds=PerformanceConfig.OVERLAY_CACHE_TTL_SECONDS
+    )
+    if db is not None:
+        try:
+            # Migrates the pre-sharding layout first, if needed
+            _read_overlay_versions()
+            cache.listener = _overlay_shards_collection().on_snapshot(cache.on_snapshot)
+        except Exception as e:
+            print(f"Overlay listener unavailable, polling instead: {e}")
+    return cache
+
+@st.cache_resource
+def get_overlay_journal():
+    """Append-only local backup of overlay edits, shared by every session in this process."""
+    return OverlayJournal(FORMATTED_QUESTIONS_BACKUP_FOLDER)
+
+def _overlay_shards_collection():
+    return db.collection(OVERLAY_COLLECTION).document(SHARDS_DOCUMENT).collection(SHARD_COLLECTION)
+
+def _overlay_shard_ref(sid):
+    return _overlay_shards_collection().document(sid)
+
+def _overlay_version_ref():
+    return db.collection(OVERLAY_COLLECTION).document(VERSION_DOCUMENT)
+
+def _read_overlay_shard(sid):
+    """Read one bank/sheet shard and its version stamp (one read)."""
+    return split_shard(_overlay_shard_ref(sid).get().to_dict())
+
+def _read_overlay_versions():
+    """Read the {shard id: version} map (one small read)."""
+    doc = _overlay_version_ref().get()
+    data = doc.to_dict() if doc.exists else {}
+    if "shards" in data and data.get(KEYED_BY_FIELD) == KEYED_BY_QUESTION_ID:
+        return data["shards"]
+
+    # First load since sharding or since question IDs: convert in bulk
+    return migrate_formatted_questions(data)
+
+def _read_row_keyed_overlay(version_data):
+    """The pre-question-ID overlay: row-keyed shards, a legacy single document or the local file."""
+    index = OverlayIndex()
+    if "shards" in version_data:
+        for doc in _overlay_shards_collection().stream():
+            data = doc.to_dict()
+            for key, field, value in split_shard(data)[0].items():
+                index.set(data["bank"], data["sheet"], key, field, value)
+        return index
+
+    for document_id in LEGACY_OVERLAY_DOCUMENTS:
+        legacy = db.collection(OVERLAY_COLLECTION).document(document_id).get()
+        if legacy.exists:
+            index, skipped = legacy_index_from_document(legacy.to_dict())
+            for key in skipped:
+                print(f"Skipped malformed formatted-question key: {key}")
+            return index
+
+    # Check if local file exists as backup
+    if os.path.exists(FORMATTED_QUESTIONS_FILE):
+        index = read_local_overlay(FORMATTED_QUESTIONS_FILE)
+    return index
+
+# Returned by _sheet_question_ids / _sheet_source_text when a bank exists but could not be loaded
+SOURCE_UNAVAILABLE = object()
+
+def _sheet_question_ids(file_path, sheet_name):
+    """Question IDs of a sheet in row order.
+
+    None if the bank file or the sheet is gone; SOURCE_UNAVAILABLE if the bank
+    exists but failed to load, so its row-keyed overrides must be kept.
+    """
+    if not os.path.exists(file_path):
+        return None
     try:
-        if db is None:
-            st.error("Firebase not initialized")
-            return {}
-        
-        # Try to load from Firebase
-        doc_ref = db.collection('formatted_questions').document('all_questions')
-        doc = doc_ref.get()
-        
-        if doc.exists:
-            return doc.to_dict()
+        bank = get_question_bank(file_path)
+    except Exception as e:
+        print(f"Could not read question IDs for {file_path} / {sheet_name}: {e}")
+        return SOURCE_UNAVAILABLE
+    if not bank:
+        return SOURCE_UNAVAILABLE
+    if sheet_name not in bank:
+        return None
+    return bank[sheet_name][QUESTION_ID_COLUMN].tolist()
+
+def migrate_formatted_questions(version_data):
+    """Rewrite the overlay as per-sheet shards keyed by question ID.
+
+    Converts the single-document layouts (or the local backup) and the
+    row-keyed shards alike; rows are mapped to IDs through the current banks.
+    A sheet whose bank cannot be loaded right now is stored as a row-keyed
+    shard and the version map is not marked keyed_by question ID, so the
+    migration runs again (shards already rekeyed are left as they are).
+    Returns the new {shard id: version} map.
+    """
+    row_keyed = _read_row_keyed_overlay(version_data)
+    old_shards = set(version_data.get("shards", {}))
+
+    # Fold pending journal entries into the local files before they are replaced
+    get_overlay_journal().compact()
+
+    version = new_version_stamp()
+    versions = {}
+    dropped = 0
+    unavailable = 0
+    batch, pending = db.batch(), 0
+    for bank, sheet, rows_overlay in row_keyed.sheets():
+        sid = shard_id(bank, sheet)
+        question_ids = _sheet_question_ids(bank, sheet)
+        if question_ids is SOURCE_UNAVAILABLE:
+            unavailable += 1
+            sheet_overlay = rows_overlay
         else:
-            # Check if local file exists as backup
-            if os.path.exists(FORMATTED_QUESTIONS_FILE):
-                with open(FORMATTED_QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Upload to Firebase for future use
-                    save_formatted_questions(data)
-                    return data
+            sheet_overlay, sheet_dropped = rekey_rows(rows_overlay, question_ids)
+            dropped += sheet_dropped
+            write_local_shard(FORMATTED_QUESTIONS_BACKUP_FOLDER, bank, sheet, sheet_overlay)
+        if len(sheet_overlay):
+            batch.set(_overlay_shard_ref(sid), shard_document(bank, sheet, sheet_overlay, version))
+            versions[sid] = version
+        elif sid in old_shards:
+            batch.delete(_overlay_shard_ref(sid))
+        else:
+            continue
+        pending += 1
+        if pending >= SHARD_WRITE_BATCH:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if dropped:
+        print(f"Dropped {dropped} formatted-question overrides whose rows no longer exist")
+    version_doc = {"shards": versions}
+    if unavailable:
+        print(f"Kept {unavailable} sheets row-keyed because their banks could not be loaded; will retry")
+    else:
+        version_doc[KEYED_BY_FIELD] = KEYED_BY_QUESTION_ID
+    # The version map goes last, so readers only see the migration once every shard exists
+    batch.set(_overlay_version_ref(), version_doc)
+    batch.commit()
+    return versions
+
+def _sheet_source_text(file_path, sheet_name):
+    """{question id: {field: original text}} for a sheet.
+
+    None if the bank file or the sheet is gone; SOURCE_UNAVAILABLE if the bank
+    exists but failed to load, so its overrides must not be treated as orphaned.
+    """
+    if not os.path.exists(file_path):
+        return None
+    try:
+        bank = get_question_bank(file_path)
+    except Exception:
+        return SOURCE_UNAVAILABLE
+    if not bank:
+        return SOURCE_UNAVAILABLE
+    if sheet_name not in bank:
+        return None
+    df = bank[sheet_name]
+    columns = {field: DISPLAY_FIELDS[field][0] for field in OVERLAY_FIELDS}
+    texts = {
+        field: [_cell_text(v) for v in df[column].tolist()] if column in df.columns else [""] * len(df)
+        for field, column in columns.items()
+    }
+    return {
+        question_id: {field: texts[field][i] for field in columns}
+        for i, question_id in enumerate(df[QUESTION_ID_COLUMN].tolist())
+    }
+
+def compact_formatted_questions(dry_run=True):
+    """Drop overlay entries equal to the source text or pointing at missing questions or sheets.
+
+    Reads every shard once and removes only the dropped keys with a merge, so
+    edits saved meanwhile survive; emptied shards stay as empty documents.
+    Returns (one report row per shard that shrinks, [(bank, sheet)] skipped
+    because their bank could not be loaded).
+    """
+    reports, skipped = [], []
+    version = new_version_stamp()
+    version_updates = {}
+    batch, pending = db.batch(), 0
+    for doc in _overlay_shards_collection().stream():
+        data = doc.to_dict() or {}
+        bank, sheet = data.get("bank", ""), data.get("sheet", "")
+        source = _sheet_source_text(bank, sheet)
+        if source is SOURCE_UNAVAILABLE:
+            skipped.append((bank, sheet))
+            continue
+        sheet_overlay, _ = split_shard(data)
+        compacted, report = compact_sheet_overlay(sheet_overlay, source)
+        dropped = {
+            (question_id, field): None
+            for question_id, field, _ in sheet_overlay.items()
+            if compacted.get(question_id, field) is None
+        }
+        if not dropped:
+            continue
+        reports.append({"Bank": bank, "Sheet": sheet, **report})
+        if dry_run:
+            continue
+
+        batch.set(doc.reference, shard_delta(bank, sheet, dropped, version, firestore.DELETE_FIELD), merge=True)
+        version_updates[doc.id] = version
+        get_overlay_journal().append(bank, sheet, dropped)
+        pending += 1
+        if pending >= SHARD_WRITE_BATCH:
+            batch.commit()
+            batch, pending = db.batch(), 0
+
+    if version_updates:
+        batch.set(_overlay_version_ref(), {"shards": version_updates}, merge=True)
+        batch.commit()
+        cache = get_overlay_cache()
+        if cache.listener is None:
+            # A live cache receives the rewritten shards from its listener
+            cache.invalidate()
+    return reports, skipped
+
+def load_formatted_questions(file_path, sheet_name):
+    """Load one sheet's formatted-question overrides from the shared cache.
+
+    The returned SheetOverlay is shared by all sessions; never mutate it, build a
+    {(question id, field): value} change set and pass it to save_formatted_questions().
+
+    Without Firestore, or if it fails, the local backup (shard files plus the
+    edit journal) is served instead.
+    """
+    if db is not None:
+        try:
+            return get_overlay_cache().get_sheet(file_path, sheet_name)
+        except Exception as e:
+            st.error(f"Error loading formatted questions: {e}")
+    return load_local_formatted_questions(file_path, sheet_name)
+
+def load_local_formatted_questions(file_path, sheet_name):
+    """One sheet's overrides from the local backup written by every save."""
+    try:
+        return get_overlay_journal().replay().sheet(file_path, sheet_name)
     except Exception as e:
-        st.error(f"Error loading formatted questions: {e}")
-    return {}
+        print(f"Could not read the local formatted-question backup: {e}")
+    return EMPTY_SHEET_OVERLAY
+
+def save_formatted_questions(file_path, sheet_name, changes):
+    """Save a delta of one sheet's overrides.
 
-def save_formatted_questions(formatted_data):
-    """Save formatted questions to Firebase."""
+    changes maps (question id, field) to the new value, or None to drop the
+    override; question ids are the bank's QUESTION_ID_COLUMN values.
+    Only those keys are sent (a merge on the shard), so a save costs the same
+    however large the overlay has grown.
+    """
     try:
         if db is None:
             st.error("Firebase not initialized")
             return False
-        
-        # Save to Firebase
-        doc_ref = db.collection('formatted_questions').document('all_questions')
-        doc_ref.set(formatted_data)
-        
+        if not changes:
+            return True
+
+        sid = shard_id(file_path, sheet_name)
+        version = new_version_stamp()
+        batch = db.batch()
+        batch.set(
+            _overlay_shard_ref(sid),
+            shard_delta(file_path, sheet_name, changes, version, firestore.DELETE_FIELD),
+            merge=True
+        )
+        batch.set(_overlay_version_ref(), {"shards": {sid: version}}, merge=True)
+        batch.commit()
+
         # Also save locally as backup
-        with open(FORMATTED_QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(formatted_data, f, indent=2, ensure_ascii=False)
-            
+        get_overlay_journal().append(file_path, sheet_name, changes)
+        # Every session in this process sees the edit immediately
+        get_overlay_cache().apply_changes(file_path, sheet_name, changes, version)
         return True
     except Exception as e:
         st.error(f"Error saving formatted questions: {e}")
@@ -1655,13 +1961,165 @@ def show_system_settings():
         if st.form_submit_button("💾 Save Settings", use_container_width=True):
             st.success("Settings saved successfully!")
             # Note: In production, save these to Firebase
+
+    show_question_bank_cache_stats()
+    show_overlay_compaction()
+
+def show_question_bank_cache_stats():
+    """Show cold (Excel parse) vs warm (compiled cache) load times per bank."""
+    st.markdown("<div style='margin-top: 1rem;'></div>", unsafe_allow_html=True)
+    with st.expander("📦 Question Bank Cache", expanded=False):
+        cache_stats = get_question_bank_cache().stats()
+        st.caption(
+            f"Shared cache: {cache_stats['banks']} banks • "
+            f"{cache_stats['bytes'] / 1024 / 1024:.1f}/{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB • "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+        )
+        overlay_stats = get_overlay_cache().stats()
+        st.caption(
+            f"Formatted overlay: {overlay_stats['cached_shards']}/{overlay_stats['shards']} sheet shards cached • "
+            f"{overlay_stats['entries']} entries • {overlay_stats['shard_reads']} shard reads / "
+            f"{overlay_stats['version_reads']} version checks / {overlay_stats['hits']} hits • "
+            + (f"live listener ({overlay_stats['pushed_shards']} shards pushed)" if overlay_stats['live']
+               else f"polling every {overlay_stats['ttl_seconds']}s")
+        )
+        render_stats = render_fragment.cache_info()
+        st.caption(
+            f"Rendered fragments: {render_stats.currsize}/{render_stats.maxsize} cached • "
+            f"{render_stats.hits} hits / {render_stats.misses} misses"
+        )
+
+        # Checked on every view; the startup prewarm result only explains failures
+        bank_status = compiled_bank_status(QUESTION_DATA_FOLDER)
+        startup_errors = {r["path"]: r["error"] for r in prewarm_question_banks_once() if not r["ok"]}
+        st.caption(f"Question banks: {sum(fresh for _, fresh in bank_status)}/{len(bank_status)} compiled and current")
+        for path, fresh in bank_status:
+            if not fresh:
+                reason = startup_errors.get(path, "changed since startup; compiles on first use")
+                st.warning(f"⚠️ {path} is not compiled: {reason}")
+
+        timings = get_load_timings()
+        if not timings:
+            st.info("No question banks have been compiled yet.")
+            return
+
+        st.dataframe(
+            pd.DataFrame([{
+                "Bank": t["bank"],
+                "Sheets": t["sheets"],
+                "Questions": t["rows"],
+                "Cold Load (s)": t["cold_seconds"],
+                "Warm Load (s)": t["warm_seconds"],
+                "Speedup": f"{t['speedup']}x" if t["speedup"] else "-",
+            } for t in timings]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+        show_column_memory_report([t["bank"] for t in timings])
+
+
+def show_overlay_compaction():
+    """Find and drop redundant or orphaned formatted-question overrides."""
+    st.markdown("<div style='margin-top: 1rem;'></div>", unsafe_allow_html=True)
+    with st.expander("🧹 Formatted Overlay Cleanup", expanded=False):
+        st.caption("Drops overrides equal to the question bank's own text and overrides whose "
+                   "question or sheet no longer exists.")
+        col_scan, col_compact = st.columns(2)
+        with col_scan:
+            scan = st.button("🔍 Scan", use_container_width=True, key="overlay_gc_scan")
+        with col_compact:
+            compact = st.button("🧹 Compact Now", use_container_width=True, type="primary", key="overlay_gc_run")
+        if not (scan or compact):
+            return
+        if db is None:
+            st.error("Firebase not initialized")
+            return
+
+        try:
+            with st.spinner("Checking overlay shards against the question banks..."):
+                reports, skipped = compact_formatted_questions(dry_run=not compact)
+        except Exception as e:
+            st.error(f"Error compacting formatted questions: {e}")
+            return
+
+        if skipped:
+            st.warning(f"Skipped {len(skipped)} sheet shards whose question bank could not be loaded: "
+                       + ", ".join(f"{bank} / {sheet}" for bank, sheet in skipped))
+
+        if not reports:
+            st.info("Nothing to reclaim; the overlay is already compact.")
+            return
+
+        report_df = pd.DataFrame(reports)
+        reclaimed = int((report_df["bytes_before"] - report_df["bytes_after"]).sum())
+        dropped = int(report_df[["equal_to_source", "missing_question", "missing_sheet"]].sum().sum())
+        verb = "Reclaimed" if compact else "Can reclaim"
+        st.success(f"{verb} {reclaimed / 1024:.1f} KB by dropping {dropped} overrides "
+                   f"from {len(report_df)} sheet shards")
+        st.dataframe(report_df, use_container_width=True, hide_index=True)
+
+def show_column_memory_report(bank_paths):
+    """Per-column memory of a bank's sheets, before and after compact dtypes."""
+    st.markdown("**🧮 Column Memory**")
+    bank_path = st.selectbox("Question bank", bank_paths, key="memory_report_bank")
+    if not st.button("Build memory report", key="memory_report_button"):
+        return
+
+    try:
+        reports = bank_memory_report(bank_path)
+    except Exception as e:
+        st.error(f"Error building memory report: {e}")
+        return
+
+    for sheet_name, report in reports.items():
+        before, after = report["Before (KB)"].sum(), report["After (KB)"].sum()
+        st.caption(f"{sheet_name}: {before:.1f} KB → {after:.1f} KB")
+        st.dataframe(report, use_container_width=True, hide_index=True)
             
-def get_question_key(file_path, sheet_name, question_index, field="question"):
-    """Generate a unique key for each question/option/image."""
-    # Normalize field names for images
-    if field in ["question_image", "image", "Question Image"]:
-        field = "question_image"
-    return f"{file_path}::{sheet_name}::{question_index}::{field}"
+_FORMATTING_TAG_RE = re.compile(r"<(?:b|strong|i|em|u|br|span|div|p)\b", re.IGNORECASE)
+# Allow-list for editor HTML: the formatting tags the editor documents, inline
+# styles limited to simple text properties, and images from http(s) URLs only
+FORMATTED_HTML_TAGS = {"b", "strong", "i", "em", "u", "br", "p", "div", "span", "img"}
+FORMATTED_HTML_ATTRIBUTES = {"*": {"style"}, "img": {"src", "style"}}
+FORMATTED_HTML_STYLES = {
+    "color", "background-color", "font-size", "font-weight", "font-style", "text-decoration",
+    "text-align", "width", "height", "max-width", "margin", "padding",
+}
+
+def sanitize_formatted_html(content):
+    """Normalize editor HTML and keep only allow-listed tags, attributes and styles.
+
+    Everything else (scripts, embeds, forms, links, event handlers, encoded
+    javascript: URLs) is dropped by nh3, which parses the markup instead of
+    pattern-matching it, so the text around removed tags is kept.
+    """
+    content = content.replace("\r\n", "\n").strip()
+    return nh3.clean(
+        content,
+        tags=FORMATTED_HTML_TAGS,
+        attributes=FORMATTED_HTML_ATTRIBUTES,
+        filter_style_properties=FORMATTED_HTML_STYLES,
+        url_schemes={"http", "https"},
+        link_rel=None,
+    )
+
+@lru_cache(maxsize=PerformanceConfig.RENDER_CACHE_SIZE)
+def render_fragment(content, sl_no=None):
+    """(markdown, unsafe_allow_html) for one question, option or explanation.
+
+    Shared by every session in the process, so the tag scan and sanitization
+    run once per distinct fragment rather than on every rerun.
+    """
+    if _FORMATTING_TAG_RE.search(content):
+        # Prefix only if Sl No is provided
+        prefix_html = f"<b>Q. {sl_no}</b> " if sl_no is not None else ""
+        return f'<div class="formatted-content">{prefix_html}{sanitize_formatted_html(content)}</div>', True
+
+    # Plain text fallback
+    if sl_no is not None:
+        return f"**Q {sl_no}.**  {content}", False
+    return content, False
 
 def render_formatted_content(content, sl_no=None, image_url=None):
     """Render formatted content with optional image."""
@@ -1672,26 +2130,13 @@ def render_formatted_content(content, sl_no=None, image_url=None):
     if not isinstance(content, str):
         content = str(content)
     
-    # Prefix only if Sl No is provided
-    prefix_html = ""
-    if sl_no is not None:
-        prefix_html = f"<b>Q. {sl_no}</b> "
-    
     # First display image if available
     if image_url is not None and not pd.isna(image_url) and str(image_url).strip() != "":
         display_question_image(image_url)
 
-    
     # Then display question text
-    if any(tag in content for tag in ['<b>', '<strong>', '<i>', '<em>', '<u>', '<br>', '<span', '<div', '<p>']):
-        final_html = f'<div class="formatted-content">{prefix_html}{content}</div>'
-        return st.markdown(final_html, unsafe_allow_html=True)
-    
-    # Plain text fallback
-    if sl_no is not None:
-        return st.markdown(f"**Q {sl_no}.**  {content}")
-    else:
-        return st.markdown(content)
+    body, unsafe_allow_html = render_fragment(content, sl_no)
+    return st.markdown(body, unsafe_allow_html=unsafe_allow_html)
 
 def show_question_editor():
     """Admin interface for editing question formatting."""
@@ -1704,11 +2149,8 @@ def show_question_editor():
         st.info("Please contact your system administrator if you need access.")
         return
     
-    # Load existing formatted questions
-    formatted_questions = load_formatted_questions()
-    
     # Folder selection
-    folder_structure = st.session_state.get('folder_structure', {})
+    folder_structure = scan_folder_structure()
     
     if not folder_structure:
         st.error("No question banks found. Please ensure Question_Data_Folder exists.")
@@ -1793,7 +2235,7 @@ def show_question_editor():
             st.markdown("<div style='margin-top: 0.5rem;'></div>", unsafe_allow_html=True)
             qb_path = os.path.join(QUESTION_DATA_FOLDER, *current_path, 'QB.xlsx')
             if os.path.exists(qb_path):
-                questions_data = load_questions(qb_path)
+                questions_data = get_question_bank(qb_path)
                 
                 if questions_data:
                     # Sheet selection
@@ -1804,22 +2246,30 @@ def show_question_editor():
                         df = questions_data[selected_sheet]
                         
                         if len(df) > 0:
-                            # Question selection
-                            question_indices = list(range(len(df)))
-                            selected_index = st.selectbox(
-                                "Select Question", 
-                                question_indices,
-                                format_func=lambda x: f"Question {x+1}: {df.iloc[x]['Question'][:100]}..."
+                            edit_mode = st.radio(
+                                "Edit mode",
+                                ["Single question", "Bulk edit"],
+                                horizontal=True,
+                                key="editor_mode"
                             )
-                            
-                            if selected_index is not None:
-                                show_question_editing_interface(
-                                    df.iloc[selected_index], 
-                                    selected_index,
-                                    qb_path,
-                                    selected_sheet,
-                                    formatted_questions
+                            if edit_mode == "Bulk edit":
+                                show_bulk_question_editor(df, qb_path, selected_sheet)
+                            else:
+                                # Question selection
+                                question_indices = list(range(len(df)))
+                                selected_index = st.selectbox(
+                                    "Select Question", 
+                                    question_indices,
+                                    format_func=lambda x: f"Question {x+1}: {df.iloc[x]['Question'][:100]}..."
                                 )
+                                
+                                if selected_index is not None:
+                                    show_question_editing_interface(
+                                        df.iloc[selected_index], 
+                                        selected_index,
+                                        qb_path,
+                                        selected_sheet
+                                    )
                         else:
                             st.warning("No questions found in this sheet.")
                 else:
@@ -1832,7 +2282,7 @@ def show_question_editor():
         if items_displayed == 0:
             st.info("No question banks or folders found in the root directory.")
         
-def show_question_editing_interface(question_row, question_index, file_path, sheet_name, formatted_questions):
+def show_question_editing_interface(question_row, question_index, file_path, sheet_name):
     """Show editing interface for a specific question."""
     st.markdown("<div style='margin-top: 0.5rem;'></div>", unsafe_allow_html=True)
     st.markdown(f"✏️ **Editing Question {question_index + 1}**")
@@ -1841,14 +2291,15 @@ def show_question_editing_interface(question_row, question_index, file_path, she
     # Store original content in session state for reliable access
     session_key = f"original_{file_path}_{sheet_name}_{question_index}"
     if session_key not in st.session_state:
+        # As text, so NA / NaN cells (StringDtype, categorical) compare equal to an empty edit
         st.session_state[session_key] = {
-            "question": question_row['Question'],
-            "option_a": question_row.get('Option A', ''),
-            "option_b": question_row.get('Option B', ''),
-            "option_c": question_row.get('Option C', ''),
-            "option_d": question_row.get('Option D', ''),
-            "explanation": question_row.get('Explanation', ''),
-            "question_image": question_row.get('Question Image', '')  # ADD THIS
+            "question": _cell_text(question_row['Question']),
+            "option_a": _cell_text(question_row.get('Option A', '')),
+            "option_b": _cell_text(question_row.get('Option B', '')),
+            "option_c": _cell_text(question_row.get('Option C', '')),
+            "option_d": _cell_text(question_row.get('Option D', '')),
+            "explanation": _cell_text(question_row.get('Explanation', '')),
+            "question_image": _cell_text(question_row.get('Question Image', ''))  # ADD THIS
         }
     
     original_content = st.session_state[session_key]
@@ -1868,22 +2319,17 @@ def show_question_editing_interface(question_row, question_index, file_path, she
         if original_content['explanation']:
             st.write(f"**Explanation:** {original_content['explanation']}")
     
-    # Generate keys for this question - ADD IMAGE KEY
-    question_key = get_question_key(file_path, sheet_name, question_index, "question")
-    image_key = get_question_key(file_path, sheet_name, question_index, "question_image")  # ADD THIS
-    option_a_key = get_question_key(file_path, sheet_name, question_index, "option_a")
-    option_b_key = get_question_key(file_path, sheet_name, question_index, "option_b")
-    option_c_key = get_question_key(file_path, sheet_name, question_index, "option_c")
-    option_d_key = get_question_key(file_path, sheet_name, question_index, "option_d")
-    explanation_key = get_question_key(file_path, sheet_name, question_index, "explanation")
-    
-    default_question = formatted_questions.get(question_key, original_content['question'])
-    default_image = formatted_questions.get(image_key, original_content.get('question_image', ''))  # ADD THIS
-    default_a = formatted_questions.get(option_a_key, original_content['option_a'])
-    default_b = formatted_questions.get(option_b_key, original_content['option_b'])
-    default_c = formatted_questions.get(option_c_key, original_content['option_c'])
-    default_d = formatted_questions.get(option_d_key, original_content['option_d'])
-    default_explanation = formatted_questions.get(explanation_key, original_content['explanation'])
+    # This sheet's overrides (shared and read-only; edits are saved as changes)
+    sheet_overlay = load_formatted_questions(file_path, sheet_name)
+    question_id = question_row[QUESTION_ID_COLUMN]
+    
+    default_question = sheet_overlay.get(question_id, "question", original_content['question'])
+    default_image = sheet_overlay.get(question_id, "question_image", original_content.get('question_image', ''))
+    default_a = sheet_overlay.get(question_id, "option_a", original_content['option_a'])
+    default_b = sheet_overlay.get(question_id, "option_b", original_content['option_b'])
+    default_c = sheet_overlay.get(question_id, "option_c", original_content['option_c'])
+    default_d = sheet_overlay.get(question_id, "option_d", original_content['option_d'])
+    default_explanation = sheet_overlay.get(question_id, "explanation", original_content['explanation'])
     
     # Formatting guide
     st.markdown("<div style='margin-top: 0.5rem;'></div>", unsafe_allow_html=True)
@@ -1987,16 +2433,23 @@ def show_question_editing_interface(question_row, question_index, file_path, she
     
     # Handle button actions after the form
     if save_btn:
-        # Save formatted content
-        formatted_questions[question_key] = edited_question
-        formatted_questions[image_key] = edited_image  # ADD THIS
-        formatted_questions[option_a_key] = edited_a
-        formatted_questions[option_b_key] = edited_b
-        formatted_questions[option_c_key] = edited_c
-        formatted_questions[option_d_key] = edited_d
-        formatted_questions[explanation_key] = edited_explanation
+        # Save formatted content (only the fields that actually changed)
+        edited = {
+            "question": edited_question,
+            "question_image": edited_image,
+            "option_a": edited_a,
+            "option_b": edited_b,
+            "option_c": edited_c,
+            "option_d": edited_d,
+            "explanation": edited_explanation,
+        }
+        changes = sheet_overlay.diff_row(question_id, {
+            # Text equal to the original needs no override, so drop it (or never store it)
+            field: None if value == _cell_text(original_content.get(field)) else value
+            for field, value in edited.items()
+        })
         
-        if save_formatted_questions(formatted_questions):
+        if save_formatted_questions(file_path, sheet_name, changes):
             st.success("✅ Changes saved successfully!")
             # Clear cache to force reload
             if 'formatted_questions_cache' in st.session_state:
@@ -2016,16 +2469,10 @@ def show_question_editing_interface(question_row, question_index, file_path, she
             st.rerun()
     
     elif reset_btn:
-        # Reset to original content
-        formatted_questions[question_key] = original_content['question']
-        formatted_questions[image_key] = original_content.get('question_image', '')  # ADD THIS
-        formatted_questions[option_a_key] = original_content['option_a']
-        formatted_questions[option_b_key] = original_content['option_b']
-        formatted_questions[option_c_key] = original_content['option_c']
-        formatted_questions[option_d_key] = original_content['option_d']
-        formatted_questions[explanation_key] = original_content['explanation']
+        # Reset to original content by dropping the overrides, not by storing copies of the source
+        changes = sheet_overlay.diff_row(question_id, {field: None for field in OVERLAY_FIELDS})
         
-        if save_formatted_questions(formatted_questions):
+        if save_formatted_questions(file_path, sheet_name, changes):
             st.success("✅ Reset to original content!")
             # Clear cache to force reload
             if 'formatted_questions_cache' in st.session_state:
@@ -2045,16 +2492,10 @@ def show_question_editing_interface(question_row, question_index, file_path, she
             st.rerun()
     
     elif clear_btn:
-        # Remove formatting (delete keys from formatted_questions)
-        keys_to_delete = []
-        for key in [question_key, image_key, option_a_key, option_b_key, option_c_key, option_d_key, explanation_key]:
-            if key in formatted_questions:
-                keys_to_delete.append(key)
-        
-        for key in keys_to_delete:
-            del formatted_questions[key]
+        # Remove formatting (delete this question's overrides)
+        changes = sheet_overlay.diff_row(question_id, {field: None for field in OVERLAY_FIELDS})
         
-        if save_formatted_questions(formatted_questions):
+        if save_formatted_questions(file_path, sheet_name, changes):
             st.success("✅ Formatting cleared!")
             # Clear cache to force reload
             if 'formatted_questions_cache' in st.session_state:
@@ -2072,52 +2513,141 @@ def show_question_editing_interface(question_row, question_index, file_path, she
                     del st.session_state[k]
             st.rerun()
 
-def get_formatted_content(file_path, sheet_name, question_index, field, original_content):
-    """Get formatted content if available, otherwise return original."""
-    # For retests, we might not have the original file path
-    if hasattr(st.session_state, 'is_retest') and st.session_state.is_retest:
-        # For retests, we need a different approach since we don't have the original file
-        # Try to get from formatted questions using the original test's file path
-        # If we don't have it, return the original content from the stored question
-        
-        # First, check if we have formatted content in cache
-        formatted_questions = load_formatted_questions()
-        
-        # Try to construct a key that might match
-        # Since we don't have the original file path in retests, we need to store it differently
-        if hasattr(st.session_state, 'retest_original_path'):
-            # Try with stored original path
-            key = get_question_key(
-                st.session_state.retest_original_path,
-                st.session_state.retest_original_sheet,
-                question_index,
-                field
-            )
-            formatted_content = formatted_questions.get(key)
-            if formatted_content:
-                return formatted_content
-        
-        # If no formatted version found, return the original content from stored question
-        return original_content
-    else:
-        # Original behavior for non-retests
-        formatted_questions = load_formatted_questions()
-        key = get_question_key(file_path, sheet_name, question_index, field)
-        # Special handling for images
-        if field == "question_image" and key not in formatted_questions:
-            # Try alternative naming if not found
-            alt_key = get_question_key(file_path, sheet_name, question_index, "image")
-            if alt_key in formatted_questions:
-                return formatted_questions.get(alt_key)
-    
-        return formatted_questions.get(key, original_content)
+# Overlay field -> column label in the bulk editor grid
+BULK_EDIT_COLUMNS = {
+    "question": "Question",
+    "question_image": "Image URL",
+    "option_a": "Option A",
+    "option_b": "Option B",
+    "option_c": "Option C",
+    "option_d": "Option D",
+    "explanation": "Explanation",
+}
+
+def _cell_text(value):
+    return "" if value is None or pd.isna(value) else str(value)
+
+def bulk_overlay_changes(sheet_overlay, question_ids, originals, edited):
+    """{(question id, field): value} for every grid cell that changed.
+
+    originals and edited hold one {field: text} dict per question. A cell
+    edited back to the sheet's own text drops its override.
+    """
+    changes = {}
+    for question_id, original, new in zip(question_ids, originals, edited):
+        for field in BULK_EDIT_COLUMNS:
+            current = sheet_overlay.get(question_id, field, original[field])
+            if new[field] == current:
+                continue
+            changes[(question_id, field)] = None if new[field] == original[field] else new[field]
+    return changes
+
+def show_bulk_question_editor(df, file_path, sheet_name):
+    """Edit many questions of a sheet in a grid and save them in one batched write."""
+    page_size = PerformanceConfig.BULK_EDIT_PAGE_SIZE
+    page_starts = list(range(0, len(df), page_size))
+    start = st.selectbox(
+        "Questions",
+        page_starts,
+        format_func=lambda x: f"{x + 1}-{min(x + page_size, len(df))} of {len(df)}",
+        key=f"bulk_page_{sheet_name}"
+    )
+    page = df.iloc[start:start + page_size]
+    question_ids = page[QUESTION_ID_COLUMN].tolist()
+
+    sheet_overlay = load_formatted_questions(file_path, sheet_name)
+    source_columns = {field: DISPLAY_FIELDS[field][0] for field in BULK_EDIT_COLUMNS}
+    originals = [
+        {field: _cell_text(row.get(column)) for field, column in source_columns.items()}
+        for _, row in page.iterrows()
+    ]
+    grid = pd.DataFrame(
+        [
+            {"#": start + offset + 1, **{
+                label: sheet_overlay.get(question_id, field, original[field])
+                for field, label in BULK_EDIT_COLUMNS.items()
+            }}
+            for offset, (question_id, original) in enumerate(zip(question_ids, originals))
+        ]
+    )
+
+    st.caption("Edit any cell; a cell set back to the original text drops its override. "
+               "Nothing is saved until you press Save.")
+    editor_key = f"bulk_editor_{file_path}_{sheet_name}_{start}"
+    edited_grid = st.data_editor(
+        grid,
+        key=editor_key,
+        hide_index=True,
+        disabled=["#"],
+        use_container_width=True,
+        num_rows="fixed"
+    )
+
+    edited = [
+        {field: _cell_text(record[label]) for field, label in BULK_EDIT_COLUMNS.items()}
+        for record in edited_grid.to_dict("records")
+    ]
+    changes = bulk_overlay_changes(sheet_overlay, question_ids, originals, edited)
+    changed_questions = len({question_id for question_id, _ in changes})
+    st.markdown(f"**{len(changes)}** changed fields in **{changed_questions}** questions")
+
+    if st.button("💾 Save All Changes", type="primary", use_container_width=True,
+                 disabled=not changes, key=f"bulk_save_{sheet_name}"):
+        progress = st.progress(0.0, text=f"Saving {len(changes)} changes...")
+        # One delta for the whole page: a single batched commit and one cache update
+        saved = save_formatted_questions(file_path, sheet_name, changes)
+        progress.progress(1.0, text="Saved" if saved else "Save failed")
+        if saved:
+            st.success(f"✅ Saved {len(changes)} changes across {changed_questions} questions!")
+            # Single invalidation: reset the grid and the single-question widgets once
+            st.session_state.pop(editor_key, None)
+            for row_index in range(start, start + len(page)):
+                for prefix in ("q", "img", "a", "b", "c", "d", "exp"):
+                    st.session_state.pop(f"{prefix}_{row_index}", None)
+            st.rerun()
+
+# Overlay field -> (source column, display column stored on the quiz snapshot)
+DISPLAY_FIELDS = {
+    "question": ("Question", "Display Question"),
+    "question_image": ("Question Image", "Display Image"),
+    "option_a": ("Option A", "Display Option A"),
+    "option_b": ("Option B", "Display Option B"),
+    "option_c": ("Option C", "Display Option C"),
+    "option_d": ("Option D", "Display Option D"),
+    "explanation": ("Explanation", "Display Explanation"),
+}
+
+def materialize_formatted_fields(quiz_df):
+    """Resolve formatted overrides for every quiz question once, into Display columns.
+
+    Each question is looked up by its source bank, sheet and question ID, so
+    shuffled quizzes and retests resolve the same overrides as the editor.
+    The quiz and the review then render from these columns without touching
+    the overlay.
+    """
+    def column(name):
+        return quiz_df[name].tolist() if name in quiz_df.columns else [''] * len(quiz_df)
+
+    overlays = {}
+    lookups = []
+    for bank, sheet, question_id in zip(column(SOURCE_BANK_COLUMN), column(SOURCE_SHEET_COLUMN),
+                                        column(QUESTION_ID_COLUMN)):
+        if (bank, sheet) not in overlays:
+            overlays[(bank, sheet)] = load_formatted_questions(bank, sheet) if bank and sheet else EMPTY_SHEET_OVERLAY
+        lookups.append((overlays[(bank, sheet)], question_id))
+
+    for field, (source_column, display_column) in DISPLAY_FIELDS.items():
+        originals = column(source_column)
+        if field == "question_image":
+            # An empty image override falls back to the sheet's image
+            values = [overlay.get(qid, field) or original for (overlay, qid), original in zip(lookups, originals)]
+        else:
+            values = [overlay.get(qid, field, original) for (overlay, qid), original in zip(lookups, originals)]
+        quiz_df[display_column] = values
+    return quiz_df
 # =============================
 # Firebase User Progress & Analytics
 # =============================
-def get_user_progress_doc_id(username):
-    """Get Firebase document ID for user progress."""
-    return f"user_{username}"
-
 def initialize_user_progress(username):
     """Create lightweight user profile document."""
     try:
@@ -2131,30 +2661,84 @@ def initialize_user_progress(username):
                 "username": username,
                 "tests_taken": 0,
                 "total_score": 0,
-                "average_score": 0,
                 "achievements": [],
                 "weak_areas": [],
                 "strong_areas": [],
+                # New users have no attempts to backfill into test_summaries
+                "test_summaries_version": TEST_SUMMARY_VERSION,
+                "attempts_by_exam": {},
+                "total_correct": 0,
+                "total_questions": 0,
                 "join_date": now_ist().isoformat(),
                 "last_updated": now_ist().isoformat()
             })
+            invalidate_run_reads("profile", username)
     except Exception as e:
         st.error(f"❌ Error initializing user progress: {e}")
         
-def save_test_result(username, test_entry):
-    """Save individual test attempt in /tests/ subcollection."""
+# Fields copied from a test attempt into its summary document
+TEST_SUMMARY_FIELDS = [
+    "test_id", "date", "exam_name", "score", "total_marks", "percentage", "correct",
+    "total_questions", "duration_minutes", "is_retest", "original_test_id", "retest_type"
+]
+# 2: summaries carry date_ts; 3: they carry sort_key, so paging needs no composite index
+TEST_SUMMARY_VERSION = 3
+
+def parse_attempt_date(value):
+    """Datetime of an attempt's stored date (ISO, or the old dd-mm-YYYY format)."""
     try:
-        tests_ref = db.collection("user_progress")\
-                      .document(username)\
-                      .collection("tests")\
-                      .document(test_entry["test_id"])
+        return datetime.fromisoformat(str(value))
+    except Exception:
+        try:
+            return datetime.strptime(str(value), "%d-%m-%Y %H:%M:%S")
+        except Exception:
+            return datetime.fromtimestamp(0)
 
-        tests_ref.set(test_entry)
+def test_summary(test_entry):
+    """Small listing record for one attempt (no question text or answers).
+
+    sort_key is the zero-padded date_ts (epoch seconds) followed by the
+    test_id: unique per attempt and ordered like (date_ts, test_id), so
+    history queries order and page on that one field.
+    """
+    summary = {field: test_entry.get(field) for field in TEST_SUMMARY_FIELDS}
+    summary["date_ts"] = parse_attempt_date(test_entry.get("date", "")).timestamp()
+    summary["sort_key"] = f"{max(int(summary['date_ts']), 0):012d}|{test_entry.get('test_id') or ''}"
+    return summary
+
+def _tests_collection(username):
+    return db.collection("user_progress").document(username).collection("tests")
+
+def _test_summaries_collection(username):
+    return db.collection("user_progress").document(username).collection("test_summaries")
+
+def save_test_result(username, test_entry, profile_update=None):
+    """Save a test attempt in /tests/ and its summary in /test_summaries/, in one batch.
+
+    profile_update, if given, is merged into the profile in the same batch.
+    """
+    try:
+        batch = db.batch()
+        batch.set(_tests_collection(username).document(test_entry["test_id"]), test_entry)
+        batch.set(_test_summaries_collection(username).document(test_entry["test_id"]), test_summary(test_entry))
+        if profile_update:
+            batch.set(_profile_ref(username), profile_update, merge=True)
+        batch.commit()
+        if profile_update:
+            invalidate_run_reads("profile", username)
         return True
     except Exception as e:
         st.error(f"❌ Error saving test result: {e}")
         return False
 
+def _profile_ref(username):
+    return db.collection("user_progress").document(username).collection("meta").document("profile")
+
+def average_score(profile):
+    """Mean score per attempt, derived from the profile's atomic counters."""
+    tests_taken = int(profile.get("tests_taken", 0) or 0)
+    return float(profile.get("total_score", 0) or 0) / tests_taken if tests_taken > 0 else 0.0
+
 def update_user_profile(username, updated_data):
     """Update lightweight user profile (small doc)."""
     try:
@@ -2166,31 +2750,12 @@ def update_user_profile(username, updated_data):
                         .document("profile")
 
         profile_ref.set(updated_data, merge=True)
+        invalidate_run_reads("profile", username)
         return True
     except Exception as e:
         st.error(f"❌ Error updating user profile: {e}")
         return False
 
-def save_user_progress(username, progress_data):
-    """Save user progress to Firebase with proper type conversion."""
-    try:
-        if db is None:
-            st.error("Firebase not initialized")
-            return False
-        
-        # Add timestamp
-        progress_data["last_updated"] = now_ist().isoformat()
-        
-        # Convert numpy types to Python native types before saving to Firestore
-        progress_data = convert_numpy_to_python(progress_data)
-        
-        doc_ref = db.collection('user_progress').document(get_user_progress_doc_id(username))
-        doc_ref.set(progress_data, merge=True)
-        return True
-    except Exception as e:
-        st.error(f"Error saving progress: {e}")
-        return False
-
 def convert_numpy_to_python(data):
     """Recursively convert numpy types to Python native types for Firestore compatibility."""
     if isinstance(data, dict):
@@ -2245,23 +2810,15 @@ def ensure_python_types(data):
         return data
         
 def load_user_progress(username):
-    """Load ONLY lightweight profile data."""
+    """Load ONLY lightweight profile data (read once per script run)."""
     try:
-        profile_ref = db.collection("user_progress")\
-                        .document(username)\
-                        .collection("meta")\
-                        .document("profile")
-
-        doc = profile_ref.get()
-        if doc.exists:
-            return doc.to_dict()
-        return {}
+        return run_read(("profile", username), lambda: _profile_ref(username).get().to_dict() or {})
     except Exception as e:
         st.error(f"❌ Error loading user profile: {e}")
         return {}
         
 def load_test_history(username):
-    """Load all test attempts (separate documents)."""
+    """Load all full test attempts (heavy; listings page through test_summaries)."""
     try:
         tests_ref = db.collection("user_progress")\
                       .document(username)\
@@ -2279,20 +2836,111 @@ def load_test_history(username):
     except Exception as e:
         st.error(f"❌ Error loading test history: {e}")
         return []
+
+def load_test_summary_page(username, after=None, limit=None):
+    """One page of attempt summaries, newest first, ordered on sort_key by Firestore.
+
+    Pass the last summary of the previous page as after. sort_key is unique
+    even where date_ts ties (legacy dates that fail to parse all map to 0),
+    so no summary is skipped at a page boundary, and ordering on one field
+    uses Firestore's built-in single-field index. Returns (summaries,
+    has_more); a page costs limit + 1 reads however many attempts the user has.
+    """
+    limit = limit or PerformanceConfig.HISTORY_PAGE_SIZE
+    query = _test_summaries_collection(username)\
+        .order_by("sort_key", direction=firestore.Query.DESCENDING)
+    if after is not None:
+        query = query.start_after({"sort_key": after.get("sort_key")})
+    summaries = [doc.to_dict() for doc in query.limit(limit + 1).stream()]
+    return summaries[:limit], len(summaries) > limit
+
+def ensure_test_summaries(username, profile):
+    """Backfill summaries and profile counters once for attempts saved before them.
+
+    Every counter is recomputed from the same scan of /tests/ and written in
+    one update, so they always agree with each other. The scan is not
+    load_test_history, which returns [] on error and would zero the counters.
+    """
+    if int(profile.get("test_summaries_version", 0)) >= TEST_SUMMARY_VERSION:
+        return profile
+
+    try:
+        history = [doc.to_dict() for doc in _tests_collection(username).stream()]
+        batch, pending = db.batch(), 0
+        for entry in history:
+            if not entry.get("test_id"):
+                continue
+            batch.set(_test_summaries_collection(username).document(entry["test_id"]), test_summary(entry))
+            pending += 1
+            if pending >= SHARD_WRITE_BATCH:
+                batch.commit()
+                batch, pending = db.batch(), 0
+        batch.commit()
+
+        attempts_by_exam = {}
+        for entry in history:
+            if not entry.get("is_retest", False):
+                name = str(entry.get("exam_name", "Unknown Test"))
+                attempts_by_exam[name] = attempts_by_exam.get(name, 0) + 1
+        counters = {
+            "test_summaries_version": TEST_SUMMARY_VERSION,
+            "tests_taken": len(history),
+            "total_score": sum(float(entry.get("score", 0) or 0) for entry in history),
+            "attempts_by_exam": attempts_by_exam,
+            "total_correct": sum(int(entry.get("correct", 0) or 0) for entry in history),
+            "total_questions": sum(int(entry.get("total_questions", 0) or 0) for entry in history),
+        }
+        # Replace, not merge, the per-exam map
+        _profile_ref(username).update(counters)
+        invalidate_run_reads("profile", username)
+        return {**profile, **counters}
+
+    except Exception as e:
+        st.error(f"❌ Error updating test summaries: {e}")
+        return profile
+
+def get_test_history_pages(username):
+    """The dashboard's loaded history pages, kept in the session across reruns."""
+    pages = st.session_state.get("test_history_pages")
+    if not pages or pages["username"] != username:
+        summaries, has_more = load_test_summary_page(username)
+        pages = {"username": username, "items": summaries, "has_more": has_more}
+        st.session_state.test_history_pages = pages
+    return pages
+
+def load_more_test_history(username):
+    pages = get_test_history_pages(username)
+    if pages["items"] and pages["has_more"]:
+        summaries, has_more = load_test_summary_page(username, after=pages["items"][-1])
+        pages["items"].extend(summaries)
+        pages["has_more"] = has_more
+
+def invalidate_test_history_pages():
+    """Drop the session's loaded history pages after an attempt is added or removed."""
+    st.session_state.pop("test_history_pages", None)
+
+def load_test_attempt(username, test_id):
+    """Fetch one full attempt (questions and answers) for a retest or review."""
+    try:
+        doc = _tests_collection(username).document(test_id).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        st.error(f"❌ Error loading test attempt: {e}")
+        return None
         
 
 def clear_user_progress(username):
     """Delete ALL user test documents + reset profile."""
     try:
-        # Delete all test docs
-        tests_ref = db.collection("user_progress")\
-                      .document(username)\
-                      .collection("tests")
-
-        for doc in tests_ref.stream():
-            doc.reference.delete()
+        # Delete all test docs and their summaries
+        for collection in (_tests_collection(username), _test_summaries_collection(username)):
+            for doc in collection.stream():
+                doc.reference.delete()
+        invalidate_test_history_pages()
 
         # Reset lightweight profile
+        _profile_ref(username).delete()
+        invalidate_run_reads("profile", username)
         initialize_user_progress(username)
         return True
 
@@ -2304,24 +2952,18 @@ def clear_user_progress(username):
 def update_user_progress(test_results):
     username = st.session_state.username
 
-    # --- Load current profile ---
-    profile_ref = db.collection("user_progress")\
-                    .document(username)\
-                    .collection("meta")\
-                    .document("profile")
-    profile = profile_ref.get().to_dict() or {}
-
-    # --- Update small profile stats ---
-    tests_taken = int(profile.get("tests_taken", 0)) + 1
-    total_score = float(profile.get("total_score", 0)) + float(test_results["Marks Obtained"])
-    avg_score = total_score / tests_taken
-
-    # Update profile
-    update_user_profile(username, {
-        "tests_taken": tests_taken,
-        "total_score": total_score,
-        "average_score": avg_score
-    })
+    # --- Small profile stats: server-side increments, no read first ---
+    # average_score is derived from tests_taken and total_score when shown
+    profile_update = {
+        "tests_taken": firestore.Increment(1),
+        "total_score": firestore.Increment(float(test_results["Marks Obtained"])),
+        "total_correct": firestore.Increment(int(test_results["Correct"])),
+        "total_questions": firestore.Increment(int(test_results["Total Questions"])),
+        "last_updated": now_ist().isoformat(),
+    }
+    if not test_results.get("is_retest", False):
+        # Attempt numbers on the dashboard come from this, not from the full history
+        profile_update["attempts_by_exam"] = {str(test_results["Exam Name"]): firestore.Increment(1)}
 
     # --- Build heavy test entry (stored separately) ---
     df = st.session_state.quiz_questions
@@ -2331,6 +2973,9 @@ def update_user_progress(test_results):
         row = df.iloc[i]
         detailed_questions.append({
             "q_index": i,
+            "question_id": str(row.get(QUESTION_ID_COLUMN, '')),
+            "bank_path": str(row.get(SOURCE_BANK_COLUMN, '')),
+            "sheet_name": str(row.get(SOURCE_SHEET_COLUMN, '')),
             "question": str(row.get('Question', '')),
             "option_a": str(row.get('Option A', '')),
             "option_b": str(row.get('Option B', '')),
@@ -2361,8 +3006,9 @@ def update_user_progress(test_results):
         "retest_type": test_results.get("retest_type", "full")
     }
 
-    # Save heavy test data separately
-    save_test_result(username, test_entry)
+    # Save heavy test data separately, together with the profile counters
+    save_test_result(username, test_entry, profile_update)
+    invalidate_test_history_pages()
 
 
 def update_achievements(progress, test_results):
@@ -2441,11 +3087,11 @@ def show_student_dashboard():
     st.markdown("📈 **Performance Overview**")
     st.markdown("<div style='margin-top: 0.5rem;'></div>", unsafe_allow_html=True)
     
+    progress = ensure_test_summaries(username, progress)
     tests_taken = int(progress.get("tests_taken", 0))
-    avg_score = float(progress.get("average_score", 0))
-    test_history = load_test_history(username)
-    total_correct = sum(int(entry.get("correct_answers", 0)) for entry in test_history)
-    total_questions = sum(int(entry.get("total_questions", 0)) for entry in test_history)
+    avg_score = average_score(progress)
+    total_correct = int(progress.get("total_correct", 0))
+    total_questions = int(progress.get("total_questions", 0))
     accuracy = (total_correct / total_questions * 100) if total_questions > 0 else 0
     achievements = progress.get("achievements", [])
     ach_count = len(achievements) if isinstance(achievements, list) else 0
@@ -2471,43 +3117,25 @@ def show_student_dashboard():
     """, unsafe_allow_html=True)
 
     st.markdown("<div style='margin-top: 2rem;'></div>", unsafe_allow_html=True)
-    # Recent Test History
-    test_history = load_test_history(username)
+    # Recent Test History: summaries only, newest first, a page at a time.
+    # The full attempt is fetched when a retest is opened.
+    history_pages = get_test_history_pages(username)
+    test_history = history_pages["items"]
     if test_history:
     
-        # --- Ensure explicit ordering: newest first (descending by date) ---
-        def parse_date_safe(d):
-            try:
-                return datetime.fromisoformat(str(d))
-            except Exception:
-                # fallback: try parsing common formats, or return epoch
-                try:
-                    return datetime.strptime(str(d), "%d-%m-%Y %H:%M:%S")
-                except Exception:
-                    return datetime.fromtimestamp(0)
-    
-        # Sort by parsed date descending (newest first)
-        test_history_sorted = sorted(
-            test_history,
-            key=lambda x: parse_date_safe(x.get("date", "")),
-            reverse=True
-        )
-    
-        # --- Precompute total (non-retest) attempts per exam name ---
-        total_attempts = {}
-        for t in test_history_sorted:
-            if not t.get("is_retest", False):
-                name = str(t.get("exam_name", "Unknown Test"))
-                total_attempts[name] = total_attempts.get(name, 0) + 1
+        # --- Total (non-retest) attempts per exam name, from the profile counters ---
+        total_attempts = {
+            str(name): int(count) for name, count in (progress.get("attempts_by_exam") or {}).items()
+        }
     
         # We'll decrement total_attempts[name] as we render newest->oldest
         attempt_counter_remaining = total_attempts.copy()
     
-        # Now render ALL tests (newest first)
-        for idx, test in enumerate(test_history_sorted):
+        # Now render the loaded tests (newest first)
+        for idx, test in enumerate(test_history):
     
             # Date formatting (safe)
-            test_date_obj = parse_date_safe(test.get("date", ""))
+            test_date_obj = parse_attempt_date(test.get("date", ""))
             try:
                 test_date = test_date_obj.astimezone(pytz.timezone("Asia/Kolkata")).strftime("%d-%m-%Y • ⏱️ %I:%M %p")
             except Exception:
@@ -2563,10 +3191,14 @@ def show_student_dashboard():
             
             if st.button("Retest 🔁", key=button_key, 
                        help="Take Re-Test", use_container_width="True"):
-                # Store in session state and immediately redirect
-                st.session_state.retest_config = test
-                st.session_state.current_screen = "retest_config"
-                st.rerun()
+                # Fetch the full attempt only now, then redirect
+                full_test = load_test_attempt(username, test_id)
+                if full_test:
+                    st.session_state.retest_config = full_test
+                    st.session_state.current_screen = "retest_config"
+                    st.rerun()
+                else:
+                    st.error("Could not load this test attempt")
                 
             # Delete Entry button
             if st.button("Delete 🗑️", key=f"delete_{test_id}", 
@@ -2578,6 +3210,11 @@ def show_student_dashboard():
                     st.error("Failed to delete test entry")
                     
             st.markdown("<div style='margin-top: 2rem;'></div>", unsafe_allow_html=True)
+
+        if history_pages["has_more"]:
+            if st.button("⬇️ Load more", use_container_width=True, key="history_load_more"):
+                load_more_test_history(username)
+                st.rerun()
     # Achievements
     st.markdown("<div style='margin-top: 0.5rem;'></div>", unsafe_allow_html=True)
     if progress.get("achievements"):
@@ -2611,32 +3248,29 @@ def show_student_dashboard():
 # =============================
 # Enhanced Folder Navigation
 # =============================
+@st.cache_resource
+def get_folder_index():
+    """Folder index shared by every session in this process."""
+    return FolderIndex(QUESTION_DATA_FOLDER, poll_seconds=PerformanceConfig.FOLDER_INDEX_POLL_SECONDS)
+
 def scan_folder_structure():
-    """Scan the Question_Data_Folder and return the folder structure."""
+    """Return the shared folder structure, picking up added/removed/changed banks.
+
+    The index is polled at most every FOLDER_INDEX_POLL_SECONDS and only the
+    subtrees that changed are rescanned; all sessions read the same tree.
+    """
     if not os.path.exists(QUESTION_DATA_FOLDER):
         st.error(f"Question data folder '{QUESTION_DATA_FOLDER}' not found!")
         return {}
     
-    folder_structure = {}
+    index = get_folder_index()
+    changes = index.refresh()
+    if changes:
+        # Free memory held for banks that were edited or deleted
+        for bank_path in changes["changed"] + changes["removed"]:
+            get_question_bank_cache().invalidate(bank_path)
     
-    for root, dirs, files in os.walk(QUESTION_DATA_FOLDER):
-        rel_path = os.path.relpath(root, QUESTION_DATA_FOLDER)
-        if rel_path == ".":
-            current_level = folder_structure
-        else:
-            path_parts = rel_path.split(os.sep)
-            current_level = folder_structure
-            for part in path_parts:
-                if part not in current_level:
-                    current_level[part] = {}
-                current_level = current_level[part]
-        
-        for dir_name in dirs:
-            current_level[dir_name] = {}
-        
-        current_level['_files'] = files
-    
-    return folder_structure
+    return index.structure
 
 def display_folder_navigation(folder_structure, current_path=None, level=0):
     """Display folder structure as clickable navigation - SIMPLIFIED VERSION."""
@@ -2708,7 +3342,7 @@ def show_folder_view_screen():
     st.write(f"**📍:** `{breadcrumb}`")
     st.markdown("<div style='margin-top: 0.2;'></div>", unsafe_allow_html=True)
 
-    folder_structure = st.session_state.folder_structure
+    folder_structure = scan_folder_structure()
     current_level = folder_structure
     for folder in current_path:
         current_level = current_level.get(folder, {})
@@ -2718,74 +3352,30 @@ def show_folder_view_screen():
     if has_qb:
         qb_path = os.path.join(QUESTION_DATA_FOLDER, *current_path, 'QB.xlsx')
         try:
-            questions_data = load_questions(qb_path)
-            if questions_data:
+            # Cards render from the precomputed catalog - no question text is loaded here
+            bank_catalog = get_bank_catalog(qb_path)
+            if bank_catalog:
                 st.session_state.current_qb_path = qb_path
-                st.session_state.current_qb_data = questions_data
                 
-                sheet_names = list(questions_data.keys())
+                sheet_names = list(bank_catalog.keys())
                 if sheet_names:
                     st.markdown("<br>", unsafe_allow_html=True)
                     # Mobile-friendly card layout for each test
                     for idx, sheet_name in enumerate(sheet_names):
-                        df = questions_data[sheet_name]
-                        
-                        # Extract metadata from the DataFrame
-                        total_questions = len(df)
+                        catalog = bank_catalog[sheet_name]
+                        total_questions = catalog["question_count"]
                         
-                        # 1. Calculate Duration
-                        time_per_question = 1.5  # Default
-                        time_columns = [col for col in df.columns if "Time in Minute/Question" in str(col)]
-                        if time_columns:
-                            try:
-                                time_col = time_columns[0]
-                                time_values = df[time_col].dropna()
-                                if not time_values.empty:
-                                    time_per_question = float(time_values.iloc[0])
-                            except:
-                                pass
-                        
-                        total_duration_minutes = int(total_questions * time_per_question)
+                        # 1. Duration
+                        total_duration_minutes = catalog_duration_minutes(catalog)
                         duration_display = f"{total_duration_minutes} min"
                         if total_duration_minutes > 60:
                             hours = total_duration_minutes // 60
                             minutes = total_duration_minutes % 60
                             duration_display = f"{hours}h {minutes}m"
                         
-                        # 2. Get Marks/Question
-                        marks_per_question = "1"  # Default
-                        marks_columns = [col for col in df.columns if "Marks/Question" in str(col) or "Marks Per Question" in str(col)]
-                        if not marks_columns:
-                            # Also check for just "Marks" column
-                            marks_columns = [col for col in df.columns if "Marks" in str(col)]
-                        
-                        if marks_columns:
-                            try:
-                                marks_col = marks_columns[0]
-                                marks_values = df[marks_col].dropna()
-                                if not marks_values.empty:
-                                    # Try to get unique value (assuming all questions have same marks)
-                                    unique_marks = marks_values.unique()
-                                    if len(unique_marks) == 1:
-                                        marks_per_question = str(unique_marks[0])
-                            except:
-                                pass
-                        
-                        # 3. Get Negative Marks/Question
-                        negative_marks_per_question = "0"  # Default
-                        negative_columns = [col for col in df.columns if "Negative Marks/Question" in str(col) or "Negative Marks Per Question" in str(col)]
-                        
-                        if negative_columns:
-                            try:
-                                negative_col = negative_columns[0]
-                                negative_values = df[negative_col].dropna()
-                                if not negative_values.empty:
-                                    # Try to get unique value
-                                    unique_negative = negative_values.unique()
-                                    if len(unique_negative) == 1:
-                                        negative_marks_per_question = str(unique_negative[0])
-                            except:
-                                pass
+                        # 2. Marks/Question and Negative Marks/Question
+                        marks_per_question = catalog["marks_per_question"] or "1"
+                        negative_marks_per_question = catalog["negative_marks_per_question"] or "0"
                         
                         # Create columns for the test card
                         col1, col2 = st.columns([1, 1])
@@ -2823,6 +3413,9 @@ def show_folder_view_screen():
                                 # Set default configuration values
                                 st.session_state.selected_sheet = sheet_name
                                 
+                                # Question columns are only read now that the test starts
+                                df = get_question_bank(qb_path)[sheet_name]
+                                
                                 # Set default configuration values (same as exam_config defaults)
                                 st.session_state.num_questions = min(100, len(df))
                                 st.session_state.use_final_key = True
@@ -2880,15 +3473,17 @@ def show_exam_config_screen():
     """Configure exam settings before starting."""
     current_path = st.session_state.get('current_path', [])
     sheet_name = st.session_state.get('selected_sheet')
-    qb_data = st.session_state.get('current_qb_data', {})
+    qb_path = st.session_state.get('current_qb_path')
+    bank_catalog = get_bank_catalog(qb_path) if qb_path and os.path.exists(qb_path) else {}
     
-    if sheet_name not in qb_data:
+    if sheet_name not in bank_catalog:
         st.error("Invalid sheet selected. Returning to folder view.")
         st.session_state.current_screen = "folder_view"
         st.rerun()
         return
     
-    df_exam = qb_data[sheet_name]
+    catalog = bank_catalog[sheet_name]
+    total_questions = catalog["question_count"]
     
     st.markdown("<div style='margin-top: 4rem;'></div>", unsafe_allow_html=True)
     show_litmusq_header("Select Exam")
@@ -2907,34 +3502,10 @@ def show_exam_config_screen():
     st.markdown("<div style='margin-top: 0.2;'></div>", unsafe_allow_html=True)
     # ===== MOBILE OPTIMIZED METADATA DISPLAY =====
     try:
-        total_questions = len(df_exam)
-    
-        # Extract duration
-        duration_columns = [c for c in df_exam.columns if "Time" in str(c)]
-        if duration_columns:
-            duration_values = df_exam[duration_columns[0]].dropna()
-            if not duration_values.empty:
-                duration_display = str(duration_values.unique()[0])
-            else:
-                duration_display = "-"
-        else:
-            duration_display = "-"
-    
-        # Marks per question
-        marks_columns = [c for c in df_exam.columns if "Marks/Question" in str(c)]
-        if marks_columns:
-            marks_values = df_exam[marks_columns[0]].dropna()
-            marks_per_question = str(marks_values.unique()[0]) if not marks_values.empty else "-"
-        else:
-            marks_per_question = "-"
-    
-        # Negative marks
-        negative_columns = [c for c in df_exam.columns if "Negative" in str(c)]
-        if negative_columns:
-            negative_values = df_exam[negative_columns[0]].dropna()
-            negative_marks_per_question = str(negative_values.unique()[0]) if not negative_values.empty else "-"
-        else:
-            negative_marks_per_question = "-"
+        time_per_question = catalog["time_per_question"]
+        duration_display = str(time_per_question) if time_per_question is not None else "-"
+        marks_per_question = catalog["marks_per_question"] or "-"
+        negative_marks_per_question = catalog["negative_marks_per_question"] or "-"
     
         metadata_html = f"""
         <div style="text-align: center; margin-top: 0.8rem;">
@@ -2953,18 +3524,10 @@ def show_exam_config_screen():
         st.warning("⚠️ Unable to load metadata summary")
 
     
-    # Enhanced metrics with expandable cards
-    # MODIFICATION 1: Check for "Subjects Covered" column first, then "Subject" column
-    subjects_column = None
-    if "Subjects Covered" in df_exam.columns:
-        subjects_column = "Subjects Covered"
-    elif "Subject" in df_exam.columns:
-        subjects_column = "Subject"
-    
+    # Enhanced metrics with expandable cards (subjects/years come from the catalog)
+    subjects_column = catalog["subjects_column"]
     if subjects_column:
-        # Get unique subjects (case-insensitive and strip whitespace)
-        subjects = df_exam[subjects_column].dropna().apply(lambda x: str(x).strip().title()).unique()
-        unique_subjects = sorted(subjects)
+        unique_subjects = catalog["subjects"]
         
         column_name_display = "Subjects Covered" if subjects_column == "Subjects Covered" else "Subject"
         with st.expander(f"📚 {column_name_display}: **{len(unique_subjects)}**", expanded=False):
@@ -2974,33 +3537,8 @@ def show_exam_config_screen():
     else:
         st.metric("Subjects Covered", "N/A")
 
-    if "Exam Year" in df_exam.columns:
-        # Get unique years (handle different formats)
-        years = df_exam["Exam Year"].dropna().apply(lambda x: str(x).strip()).unique()
-        
-        # Convert to numeric for proper sorting and remove duplicates
-        unique_years = []
-        for year in years:
-            try:
-                # Try to convert to integer for proper sorting
-                numeric_year = int(year)
-                if numeric_year not in unique_years:
-                    unique_years.append(numeric_year)
-            except ValueError:
-                # If not numeric, keep as string and ensure uniqueness
-                if year not in unique_years:
-                    unique_years.append(year)
-        
-        # Sort years properly
-        try:
-            # Sort numeric years in descending order (most recent first)
-            numeric_years = [y for y in unique_years if isinstance(y, int)]
-            string_years = [y for y in unique_years if isinstance(y, str)]
-            sorted_years = sorted(numeric_years, reverse=True) + sorted(string_years)
-        except:
-            # Fallback: sort everything as strings
-            sorted_years = sorted(unique_years, key=str, reverse=True)
-        
+    sorted_years = catalog["years"]
+    if sorted_years:
         with st.expander(f"📅 Years Covered: **{len(sorted_years)}**", expanded=False):
             for year in sorted_years:
                 st.write(f"• {year}")
@@ -3012,64 +3550,34 @@ def show_exam_config_screen():
     use_final_key = True
     
     with st.expander("🎛️ Advanced Options"):
-        # MODIFICATION 2: Dynamic time per question from Excel
-        time_per_question = 1.5  # Default value
-        
-        # Look for "Time in Minute/Question" in column headers
-        time_columns = [col for col in df_exam.columns if "Time in Minute/Question" in str(col)]
-        
-        if time_columns:
-            # Get the first row value from the time column (assumes it's the same for all rows)
-            time_col = time_columns[0]
-            try:
-                # Get the first non-null value
-                time_values = df_exam[time_col].dropna()
-                if not time_values.empty:
-                    # Try to convert to float, use default if conversion fails
-                    time_per_question = float(time_values.iloc[0])
-                    st.markdown(
-                        f"""
-                        <div style="
-                            font-size: 1.2rem;
-                            font-weight: 600;
-                            padding: 6px 0;
-                            color: #541747;
-                        ">
-                            ⏱️ You have {time_per_question} minutes to answer each question.
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-            except (ValueError, TypeError) as e:
-                st.warning(f"Could not read time per question from Excel. Using default 1.5 minutes. Error: {e}")
-                time_per_question = 1.5
+        # Dynamic time per question from the sheet catalog
+        time_per_question = catalog["time_per_question"]
+        if time_per_question is not None:
+            st.markdown(
+                f"""
+                <div style="
+                    font-size: 1.2rem;
+                    font-weight: 600;
+                    padding: 6px 0;
+                    color: #541747;
+                ">
+                    ⏱️ You have {time_per_question} minutes to answer each question.
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
         else:
-            # Check if there's a cell with this value in the first few rows
-            # Sometimes this might be in a metadata row rather than a column header
-            for i in range(min(5, len(df_exam))):
-                row = df_exam.iloc[i]
-                for cell_value in row:
-                    if isinstance(cell_value, str) and "Time in Minute/Question" in cell_value:
-                        try:
-                            # Extract number from string like "Time in Minute/Question: 2"
-                            import re
-                            match = re.search(r'[\d.]+', cell_value)
-                            if match:
-                                time_per_question = float(match.group())
-                                st.info(f"⏱️ Found time per question in metadata: {time_per_question} minutes")
-                                break
-                        except:
-                            pass
+            time_per_question = DEFAULT_TIME_PER_QUESTION
         
         # Calculate default duration based on dynamic time per question
-        default_duration = int(len(df_exam) * time_per_question)
+        default_duration = catalog_duration_minutes(catalog)
         
         # Move both inputs inside the expander
         num_questions = st.number_input(
             "❓ Number of Questions", 
             min_value=1, 
-            max_value=len(df_exam),
-            value=min(100, len(df_exam)), 
+            max_value=total_questions,
+            value=min(100, total_questions), 
             step=1,
             key="num_questions"
         )
@@ -3098,6 +3606,8 @@ def show_exam_config_screen():
         st.session_state.live_progress_enabled = show_live_progress
         st.session_state.auto_save_enabled = enable_auto_save
         
+        # Question columns are only read once the test actually starts
+        df_exam = get_question_bank(qb_path)[sheet_name]
         start_quiz(df_exam, num_questions, exam_duration, use_final_key, sheet_name)
         st.session_state.current_screen = "quiz"
         st.rerun()
@@ -3184,28 +3694,13 @@ def show_enhanced_question_interface():
     if st.session_state.question_status[current_idx]['status'] == 'not_visited':
         update_question_status(current_idx, 'not_answered')
     
-    # Get formatted content
-    file_path = st.session_state.get('current_qb_path', '')
-    sheet_name = st.session_state.get('selected_sheet', '')
-    
-    formatted_question = get_formatted_content(
-        file_path, sheet_name, current_idx, "question", row['Question']
-    )
-    
-    # NEW: Get image URL if available
-    image_url = None
-    if 'Question Image' in row:
-        image_url = row['Question Image']
-        # Also try to get formatted image URL if exists
-        image_key = get_question_key(file_path, sheet_name, current_idx, "question_image")
-        formatted_questions = load_formatted_questions()
-        formatted_image_url = formatted_questions.get(image_key)
-        if formatted_image_url:
-            image_url = formatted_image_url
-    formatted_a = get_formatted_content(file_path, sheet_name, current_idx, "option_a", row.get('Option A', ''))
-    formatted_b = get_formatted_content(file_path, sheet_name, current_idx, "option_b", row.get('Option B', ''))
-    formatted_c = get_formatted_content(file_path, sheet_name, current_idx, "option_c", row.get('Option C', ''))
-    formatted_d = get_formatted_content(file_path, sheet_name, current_idx, "option_d", row.get('Option D', ''))
+    # Formatted content was resolved into the quiz snapshot by start_quiz
+    formatted_question = row['Display Question']
+    image_url = row['Display Image']
+    formatted_a = row['Display Option A']
+    formatted_b = row['Display Option B']
+    formatted_c = row['Display Option C']
+    formatted_d = row['Display Option D']
     
     # Enhanced question card with formatted content
     # Render formatted question
@@ -3865,9 +4360,14 @@ def compute_results():
     use_final = st.session_state.use_final_key
     user_ans = st.session_state.answers
 
-    df["Correct Option Used"] = df.apply(lambda r: get_correct_option(r, use_final), axis=1)
+    # Answer keys are pre-normalized into int8 codes, so grading is one vectorized comparison
+    correct_codes = correct_option_codes(df, use_final)
+    answer_codes = np.array([OPTION_CODES.get(user_ans.get(i), NO_ANSWER_CODE) for i in range(len(df))], dtype=np.int8)
+    is_correct = (answer_codes == correct_codes) & (correct_codes != NO_ANSWER_CODE)
+
+    df["Correct Option Used"] = option_letters(correct_codes)
     df["Your Answer"] = [user_ans.get(i, None) for i in range(len(df))]
-    df["Is Correct"] = df["Your Answer"] == df["Correct Option Used"]
+    df["Is Correct"] = is_correct
 
     if "Marks" in df.columns:
         df["Marks"] = pd.to_numeric(df["Marks"], errors="coerce").fillna(0)
@@ -3882,26 +4382,22 @@ def compute_results():
     
     attempted = sum(1 for status in st.session_state.question_status.values() 
                    if status['answer'] is not None)
-    correct = int(df["Is Correct"].sum())
+    correct = int(is_correct.sum())
     
     # Create detailed answers list for retest functionality
-    detailed_answers = []
-    for i in range(len(df)):
-        user_answer = user_ans.get(i, None)
-        correct_answer = df.iloc[i]["Correct Option Used"]
-        is_correct = df.iloc[i]["Is Correct"]
-        
-        # Convert numpy bool to Python bool
-        if isinstance(is_correct, (np.bool_, np.bool)):
-            is_correct = bool(is_correct)
-        
-        detailed_answers.append({
+    correct_letters = df["Correct Option Used"].tolist()
+    question_ids = df[QUESTION_ID_COLUMN].tolist() if QUESTION_ID_COLUMN in df.columns else [''] * len(df)
+    detailed_answers = [
+        {
             "question_index": int(i),  # Ensure integer
-            "user_answer": user_answer,
-            "correct_answer": correct_answer,
-            "is_correct": is_correct,
+            "question_id": str(question_ids[i]),
+            "user_answer": user_ans.get(i, None),
+            "correct_answer": correct_letters[i],
+            "is_correct": bool(is_correct[i]),
             "marked": bool(st.session_state.question_status.get(i, {}).get('marked', False))
-        })
+        }
+        for i in range(len(df))
+    ]
     summary = {
         "Exam Name": st.session_state.exam_name,
         "Total Questions": int(len(df)),
@@ -3919,49 +4415,62 @@ def compute_results():
     }
     return df, summary
     
+def _attempt_profile_decrements(entry):
+    """Negative Increments removing one attempt from the profile counters."""
+    profile_update = {
+        "tests_taken": firestore.Increment(-1),
+        "total_score": firestore.Increment(-float(entry.get("score", 0) or 0)),
+        "total_correct": firestore.Increment(-int(entry.get("correct", 0) or 0)),
+        "total_questions": firestore.Increment(-int(entry.get("total_questions", 0) or 0)),
+        "last_updated": now_ist().isoformat(),
+    }
+    if not entry.get("is_retest", False):
+        profile_update["attempts_by_exam"] = {
+            str(entry.get("exam_name", "Unknown Test")): firestore.Increment(-1)
+        }
+    return profile_update
+
+@firestore.transactional
+def _delete_attempt_in_transaction(transaction, username, test_id):
+    """Delete one attempt and subtract it from the profile; False if it is already gone.
+
+    The attempt is read inside the transaction, so two deletes of the same
+    test (or a double click) subtract it only once.
+    """
+    summary_ref = _test_summaries_collection(username).document(test_id)
+    test_ref = _tests_collection(username).document(test_id)
+    entry = summary_ref.get(transaction=transaction).to_dict()
+    if entry is None:
+        entry = test_ref.get(transaction=transaction).to_dict()
+    if entry is None:
+        return False
+
+    transaction.delete(test_ref)
+    transaction.delete(summary_ref)
+    transaction.set(_profile_ref(username), _attempt_profile_decrements(entry), merge=True)
+    return True
+
 def delete_test_entry(username, test_id):
-    """Delete a specific test entry and update progress."""
+    """Delete one attempt and subtract it from the profile counters.
+
+    Reads only the attempt's summary (or its full document if it has none),
+    so the cost does not grow with the history.
+    """
     try:
         if db is None:
             st.error("Firebase not initialized")
             return False
 
-        # ---- 1) Delete test document in Firestore ----
-        test_ref = db.collection("user_progress") \
-                     .document(username) \
-                     .collection("tests") \
-                     .document(test_id)
-
-        if test_ref.get().exists:
-            test_ref.delete()
-        else:
+        if not _delete_attempt_in_transaction(db.transaction(), username, test_id):
             return False
 
-        # ---- 2) Reload updated test history ----
-        updated_history = load_test_history(username)
-
-        # ---- 3) Load and update progress profile ----
-        progress = load_user_progress(username)
-        progress = convert_numpy_to_python(progress)
-
-        progress["tests_taken"] = len(updated_history)
-
-        if updated_history:
-            progress["total_score"] = float(sum(float(t.get("score", 0)) for t in updated_history))
-            progress["average_score"] = progress["total_score"] / len(updated_history)
-        else:
-            progress["total_score"] = 0.0
-            progress["average_score"] = 0.0
-
-        # ---- 4) Save updated progress ----
-        save_user_progress(username, progress)
-
+        invalidate_run_reads("profile", username)
+        invalidate_test_history_pages()
         return True
 
     except Exception as e:
         st.error(f"Error deleting test entry: {e}")
         return False
-
         
 def show_retest_config(original_test):
     """Show configuration for retest based on original test."""
@@ -4101,7 +4610,11 @@ def show_retest_config(original_test):
             # ✅ Media fields for retest
             'Question Image': q_data.get('question_image', ''),
             'Explanation Image': q_data.get('explanation_image', ''),
-            'Explanation Media': q_data.get('explanation_media', '')
+            'Explanation Media': q_data.get('explanation_media', ''),
+            # Source and ID, so overlays resolve (absent on results saved before IDs)
+            QUESTION_ID_COLUMN: q_data.get('question_id', ''),
+            SOURCE_BANK_COLUMN: q_data.get('bank_path', ''),
+            SOURCE_SHEET_COLUMN: q_data.get('sheet_name', '')
         })
     
     df_questions = pd.DataFrame(questions_list)
@@ -4134,10 +4647,6 @@ def show_retest_config(original_test):
             # This is a retest of a retest, add level indicator
             exam_name = f"{exam_name}📝"
         
-        # Set dummy file path and sheet name for formatting lookup
-        st.session_state.retest_original_path = "retest_" + str(original_test.get('test_id', 'unknown'))
-        st.session_state.retest_original_sheet = exam_name
-        
         # Get the original duration or use default
         original_duration = original_test.get('duration_minutes', 60)
         if original_duration == 0:
@@ -4156,26 +4665,14 @@ def show_retest_config(original_test):
 def show_enhanced_detailed_analysis(res_df):
     """Show detailed analysis with formatted content and question status in headings."""
     for i, row in res_df.iterrows():
-        file_path = st.session_state.get('current_qb_path', '')
-        sheet_name = st.session_state.get('selected_sheet', '')
-        
-        # Get formatted content
-        formatted_question = get_formatted_content(file_path, sheet_name, i, "question", row['Question'])
-        # NEW: Get image URL
-        image_url = None
-        if 'Question Image' in row:
-            image_url = row['Question Image']
-            # Check for formatted image URL
-            image_key = get_question_key(file_path, sheet_name, i, "question_image")
-            formatted_questions = load_formatted_questions()
-            formatted_image_url = formatted_questions.get(image_key)
-            if formatted_image_url:
-                image_url = formatted_image_url
-        formatted_a = get_formatted_content(file_path, sheet_name, i, "option_a", row.get('Option A', ''))
-        formatted_b = get_formatted_content(file_path, sheet_name, i, "option_b", row.get('Option B', ''))
-        formatted_c = get_formatted_content(file_path, sheet_name, i, "option_c", row.get('Option C', ''))
-        formatted_d = get_formatted_content(file_path, sheet_name, i, "option_d", row.get('Option D', ''))
-        formatted_explanation = get_formatted_content(file_path, sheet_name, i, "explanation", row.get('Explanation', ''))
+        # Formatted content was resolved into the quiz snapshot by start_quiz
+        formatted_question = row['Display Question']
+        image_url = row['Display Image']
+        formatted_a = row['Display Option A']
+        formatted_b = row['Display Option B']
+        formatted_c = row['Display Option C']
+        formatted_d = row['Display Option D']
+        formatted_explanation = row['Display Explanation']
         
         # Determine question status for heading
         correct = row["Correct Option Used"]
@@ -4418,7 +4915,7 @@ def optimize_session_state():
     """Clean up and optimize session state to prevent bloat."""
     essential_keys = {
         'logged_in', 'username', 'user_type', 'current_screen', 'current_path',  # ← Added user_type
-        'selected_sheet', 'current_qb_path', 'folder_structure',
+        'selected_sheet', 'current_qb_path',
         'quiz_started', 'quiz_questions', 'current_idx', 'answers',
         'submitted', 'exam_name', 'question_status', 'quiz_duration',
         'use_final_key', 'started_at', 'end_time', 'last_cleanup'
@@ -4474,94 +4971,54 @@ def safe_execute(func, *args, **kwargs):
 # =============================
 # Helper Functions
 # =============================
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    mapping = {c: str(c).strip() for c in df.columns}
-    return df.rename(columns=mapping)
-    
-def convert_google_drive_url(url):
-    """Convert any Google Drive URL to the working thumbnail format."""
-    if not url or pd.isna(url):
-        return url
-    
-    url = str(url).strip()
-    
-    # If it's already in the working format, keep it
-    if "lh3.googleusercontent.com/d/" in url:
-        return url
-    
-    # Convert from other Google Drive formats
-    if "drive.google.com" in url:
-        # Extract file ID from: /file/d/FILE_ID/view
-        if "/file/d/" in url:
-            file_id = url.split("/file/d/")[1].split("/")[0]
-            return f"https://lh3.googleusercontent.com/d/{file_id}"
-    
-    # Return unchanged if not a Google Drive URL
-    return url
-    
 def load_questions(file_path):
-    """Load questions from Excel file with memory optimization."""
+    """Open a question bank from the compiled question-bank cache.
+
+    The workbook is only re-parsed when it has changed since it was last
+    compiled, and sheets are read lazily (see question_bank_store.QuestionBank).
+    """
     try:
-        # Define essential columns to load
-        essential_columns = [
-            'Question', 'Option A', 'Option B', 'Option C', 'Option D',
-            'Explanation', 'Correct Option (Final Answer Key)',
-            'Correct option (Provisional Answer Key)', 'Marks', 'Subject', 'Exam Year',
-            'Question Image'  # ADD THIS LINE
-        ]
-        
-        # Read only necessary columns
-        df_dict = pd.read_excel(
-            file_path, 
-            sheet_name=None, 
-            engine="openpyxl",
-            usecols=lambda x: any(col in x for col in essential_columns)
-        )
-        
-        clean_dict = {}
-        for sheet, df in df_dict.items():
-            df = _normalize_columns(df)
-            
-            # Optional: Convert image URLs if the column exists
-            if 'Question Image' in df.columns:
-                df['Question Image'] = df['Question Image'].apply(convert_google_drive_url)
-            
-            # Optimize memory usage
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    # Convert to string type for better memory usage
-                    df[col] = df[col].astype('string')
-            
-            # Fill NA values efficiently
-            text_columns = ["Question", "Option A", "Option B", "Option C", "Option D", "Explanation"]
-            for col in text_columns:
-                if col in df.columns:
-                    df[col] = df[col].fillna("")
-            
-            clean_dict[sheet] = df
-            
-        return clean_dict
+        return load_compiled_bank(file_path)
     except Exception as e:
         st.error(f"Error loading questions from {file_path}: {e}")
         return {}
 
-def get_correct_option(row, use_final_key=True):
-    final_col = "Correct Option (Final Answer Key)"
-    prov_col = "Correct option (Provisional Answer Key)"
-    val = None
-    if use_final_key and final_col in row and str(row[final_col]).strip():
-        val = str(row[final_col]).strip()
-    elif prov_col in row and str(row[prov_col]).strip():
-        val = str(row[prov_col]).strip()
-    if val is None:
-        return None
-    v = val.strip().upper()
-    mapping = {
-        "A": "A", "B": "B", "C": "C", "D": "D",
-        "1": "A", "2": "B", "3": "C", "4": "D",
-        "OPTION A": "A", "OPTION B": "B", "OPTION C": "C", "OPTION D": "D",
-    }
-    return mapping.get(v, v[:1] if v[:1] in ["A", "B", "C", "D"] else None)
+@st.cache_resource
+def get_question_bank_cache():
+    """Single question-bank cache shared by every session in this process."""
+    return QuestionBankCache(max_bytes=PerformanceConfig.QB_CACHE_MAX_MB * 1024 * 1024)
+
+@st.cache_resource(show_spinner=False)
+def prewarm_question_banks_once():
+    """Compile every QB.xlsx once per server process, in parallel.
+
+    Runs before the first screen is served so exam starts never pay the
+    Excel parse cost. Sessions arriving meanwhile wait on the same call.
+    This is the only startup prewarm; deployments should not also run the
+    question_bank_store.py prewarm command.
+    """
+    return prewarm_question_banks(
+        QUESTION_DATA_FOLDER,
+        max_workers=PerformanceConfig.PREWARM_WORKERS,
+        progress=print_prewarm_progress
+    )
+
+def get_bank_catalog(file_path):
+    """Per-sheet metadata (counts, timing, marks, subjects, years) for a bank.
+
+    Comes from the shared bank's manifest, so no sheet rows are loaded.
+    """
+    bank = get_question_bank(file_path)
+    return bank.catalog if bank else {}
+
+def get_question_bank(file_path):
+    """Return the shared, read-only bank for file_path.
+
+    Sessions keep only the path (current_qb_path) and look the bank up here,
+    so 300 students on one mock test share a single copy of its DataFrames.
+    Sheets load lazily the first time bank[sheet] is used.
+    """
+    return get_question_bank_cache().get(file_path, load_questions)
 
 def start_quiz(df: pd.DataFrame, n_questions: int, duration_minutes: int,
                use_final_key: bool, exam_name: str):
@@ -4573,10 +5030,18 @@ def start_quiz(df: pd.DataFrame, n_questions: int, duration_minutes: int,
     
     if shuffle_enabled:
         # Shuffle the questions
-        sampled = df.sample(n=n, random_state=np.random.randint(0, 10**9)).reset_index(drop=True)
+        source_rows = np.random.RandomState(np.random.randint(0, 10**9)).choice(len(df), size=n, replace=False)
     else:
         # Take first n questions without shuffling
-        sampled = df.head(n).reset_index(drop=True)
+        source_rows = np.arange(n)
+    sampled = df.iloc[source_rows].reset_index(drop=True)
+
+    # Record each question's source; retest frames already carry theirs
+    if SOURCE_BANK_COLUMN not in sampled.columns:
+        sampled[SOURCE_BANK_COLUMN] = st.session_state.get('current_qb_path', '')
+        sampled[SOURCE_SHEET_COLUMN] = st.session_state.get('selected_sheet', '')
+    # Resolve formatted overrides once; renders then read the snapshot only
+    sampled = materialize_formatted_fields(sampled)
     
     st.session_state.quiz_questions = sampled
     st.session_state.order = list(range(len(sampled)))
@@ -4649,7 +5114,7 @@ def show_home_screen():
     
     st.write(f"**📍:** `{breadcrumb}`")
     st.markdown("<div style='margin-top: 0.2;'></div>", unsafe_allow_html=True)
-    folder_structure = st.session_state.get('folder_structure', {})
+    folder_structure = scan_folder_structure()
     if folder_structure:
         display_folder_navigation(folder_structure)
     else:
@@ -4774,8 +5239,6 @@ def initialize_state():
         "current_path": [],
         "selected_sheet": None,
         "current_qb_path": None,
-        "current_qb_data": {},
-        "folder_structure": {},
         "quiz_duration": 0,
         "question_status": {},
         "live_progress_enabled": True,
@@ -4828,6 +5291,13 @@ def main():
     # Initialize session state with stability features
     initialize_state()
     
+    # Reads below hit Firestore / the login sheets at most once in this run
+    begin_run_reads()
+    
+    # Compile question banks before accepting exam starts (once per process)
+    with st.spinner("📦 Preparing question banks..."):
+        prewarm_question_banks_once()
+    
     # RECOVERY: If user is logged in but user_type is missing, determine it
     if st.session_state.get('logged_in') and 'user_type' not in st.session_state:
         username = st.session_state.get('username')
@@ -4840,10 +5310,8 @@ def main():
                 # Check Firebase for admin role
                 try:
                     if db:
-                        user_ref = db.collection('users').document(username)
-                        user_doc = user_ref.get()
-                        if user_doc.exists:
-                            user_data = user_doc.to_dict()
+                        user_data = get_user_doc(username)
+                        if user_data is not None:
                             if user_data.get('role') == 'admin':
                                 st.session_state.user_type = 'admin'
                             else:
@@ -4916,11 +5384,6 @@ def main():
                 del st.session_state[key]
             st.rerun()
     
-    # Scan folder structure on first load with error handling
-    if not st.session_state.folder_structure:
-        with st.spinner("📁 Scanning Question Banks..."):
-            st.session_state.folder_structure = safe_execute(scan_folder_structure) or {}
-    
     # Route to appropriate screen with error handling
     screen_handlers = {
         "home": optimized_show_home_screen,
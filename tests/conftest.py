@@ -0,0 +1,61 @@
+import os
+import sys
+
+import openpyxl
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QB_HEADER = ["Question", "Option A", "Option B", "Option C", "Option D", "Correct Option (Final Answer Key)"]
+
+
+def write_workbook(path, sheets):
+    """Write {sheet name: rows} as an .xlsx file; the first row is the header."""
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+
+
+@pytest.fixture
+def qb_cache(tmp_path, monkeypatch):
+    """Compile question banks into a per-test cache folder."""
+    import question_bank_store
+    monkeypatch.setattr(question_bank_store, "QB_CACHE_FOLDER", str(tmp_path / "qb_cache"))
+
+
+@pytest.fixture
+def db():
+    from inmemory_firestore import InMemoryFirestore
+    return InMemoryFirestore()
+
+
+@pytest.fixture
+def app(db, qb_cache, tmp_path, monkeypatch):
+    """The Streamlit app module wired to a fresh in-memory Firestore.
+
+    Runs in tmp_path so local backups land there, with empty process-wide caches.
+    """
+    import streamlit as st
+    import benchmark_pipeline
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    module, _ = benchmark_pipeline.import_app(db)
+    yield module
+    st.cache_resource.clear()
+
+
+@pytest.fixture
+def bank_path(tmp_path):
+    path = str(tmp_path / "QB.xlsx")
+    write_workbook(path, {"Paper 1": [
+        QB_HEADER,
+        ["one", "a", "b", "c", "d", "A"],
+        ["two", "a", "b", "c", "d", "B"],
+        ["three", "a", "b", "c", "d", "C"],
+    ]})
+    return path
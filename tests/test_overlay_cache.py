@@ -0,0 +1,111 @@
+import itertools
+
+import pytest
+
+from inmemory_firestore import InMemoryFirestore
+from overlay_store import OverlayCache, SheetOverlay, shard_document, shard_id, split_shard
+
+BANK, SHEET = "bank/QB.xlsx", "Paper 1"
+SID = shard_id(BANK, SHEET)
+
+
+@pytest.fixture
+def shards():
+    return InMemoryFirestore().collection("shards")
+
+
+@pytest.fixture
+def stamps():
+    return itertools.count(1)
+
+
+def _save(shards, stamps, overrides):
+    overlay = SheetOverlay()
+    for (question_id, field), value in overrides.items():
+        overlay.set(question_id, field, value)
+    version = next(stamps)
+    shards.document(SID).set(shard_document(BANK, SHEET, overlay, version))
+    return version
+
+
+def _cache(shards, ttl_seconds=30):
+    return OverlayCache(
+        load_sheet=lambda sid: split_shard(shards.document(sid).get().to_dict()),
+        load_versions=lambda: {doc.id: split_shard(doc.to_dict())[1] for doc in shards.stream()},
+        ttl_seconds=ttl_seconds,
+    )
+
+
+def test_listener_pushes_updates_without_reads(shards, stamps):
+    _save(shards, stamps, {("q1", "question"): "first"})
+    cache = _cache(shards)
+    cache.listener = shards.on_snapshot(cache.on_snapshot)
+
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "first"
+    _save(shards, stamps, {("q1", "question"): "second"})
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "second"
+
+    shards.document(SID).delete()
+    assert len(cache.get_sheet(BANK, SHEET)) == 0
+    stats = cache.stats()
+    assert stats["live"] and stats["shard_reads"] == 0 and stats["version_reads"] == 0
+
+
+def test_ttl_polling_without_listener(shards, stamps):
+    _save(shards, stamps, {("q1", "question"): "first"})
+    cache = _cache(shards, ttl_seconds=0)
+
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "first"
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "first"
+    assert cache.stats()["shard_reads"] == 1
+
+    _save(shards, stamps, {("q1", "question"): "second"})
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "second"
+    assert cache.stats()["shard_reads"] == 2
+
+
+def test_invalidate_falls_back_until_next_snapshot(shards, stamps):
+    _save(shards, stamps, {("q1", "question"): "first"})
+    cache = _cache(shards)
+    cache.listener = shards.on_snapshot(cache.on_snapshot)
+
+    cache.invalidate()
+    assert not cache.stats()["live"]
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "first"
+    assert cache.stats()["shard_reads"] == 1
+
+    # The next pushed snapshot rebuilds the whole cache and goes live again
+    _save(shards, stamps, {("q1", "question"): "second", ("q2", "question"): "other"})
+    assert cache.stats()["live"]
+    assert cache.get_sheet(BANK, SHEET).get("q2", "question") == "other"
+
+
+def test_apply_changes_swaps_in_a_new_overlay(shards, stamps):
+    version = _save(shards, stamps, {("q1", "question"): "first"})
+    cache = _cache(shards)
+    cache.listener = shards.on_snapshot(cache.on_snapshot)
+    before = cache.get_sheet(BANK, SHEET)
+
+    cache.apply_changes(BANK, SHEET, {("q1", "question"): None, ("q2", "question"): "new"}, version + 1)
+
+    assert before.get("q1", "question") == "first"
+    after = cache.get_sheet(BANK, SHEET)
+    assert after is not before
+    assert after.get("q1", "question") is None and after.get("q2", "question") == "new"
+
+
+def test_live_cache_falls_back_when_the_listener_stops(shards, stamps):
+    _save(shards, stamps, {("q1", "question"): "first"})
+    cache = _cache(shards, ttl_seconds=0)
+    cache.listener = shards.on_snapshot(cache.on_snapshot)
+
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "first"
+    assert cache.stats()["live"] and cache.stats()["shard_reads"] == 0
+
+    # The stream closes, so this save is never pushed
+    cache.listener.unsubscribe()
+    _save(shards, stamps, {("q1", "question"): "second"})
+
+    assert cache.get_sheet(BANK, SHEET).get("q1", "question") == "second"
+    stats = cache.stats()
+    assert not stats["live"] and stats["shard_reads"] == 1
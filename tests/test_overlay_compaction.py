@@ -0,0 +1,47 @@
+def _question_ids(app, bank_path):
+    return list(app.get_question_bank(bank_path)["Paper 1"]["Question ID"])
+
+
+def test_compaction_drops_redundant_and_orphaned_keys(app, bank_path):
+    q0, q1, _ = _question_ids(app, bank_path)
+    app.save_formatted_questions(bank_path, "Paper 1", {
+        (q0, "question"): "one",
+        (q1, "question"): "<b>two</b>",
+        ("qgone", "option_a"): "x",
+    })
+
+    reports, skipped = app.compact_formatted_questions(dry_run=False)
+
+    assert skipped == []
+    assert reports[0]["equal_to_source"] == 1
+    assert reports[0]["missing_question"] == 1
+    assert app.load_formatted_questions(bank_path, "Paper 1").to_storage() == {"question": {q1: "<b>two</b>"}}
+
+
+def test_compaction_skips_banks_that_fail_to_load(app, bank_path, monkeypatch):
+    q0 = _question_ids(app, bank_path)[0]
+    app.save_formatted_questions(bank_path, "Paper 1", {(q0, "question"): "<b>kept</b>"})
+    monkeypatch.setattr(app, "get_question_bank", lambda file_path: {})
+
+    reports, skipped = app.compact_formatted_questions(dry_run=False)
+
+    assert reports == []
+    assert skipped == [(bank_path, "Paper 1")]
+    assert app.load_formatted_questions(bank_path, "Paper 1").get(q0, "question") == "<b>kept</b>"
+
+
+def test_compaction_keeps_edits_saved_after_its_read(app, bank_path, monkeypatch):
+    q0, q1, _ = _question_ids(app, bank_path)
+    app.save_formatted_questions(bank_path, "Paper 1", {(q0, "question"): "one"})
+    source_text = app._sheet_source_text
+
+    def source_text_with_concurrent_save(file_path, sheet_name):
+        # Another session saves after compaction has read the shard
+        app.save_formatted_questions(bank_path, "Paper 1", {(q1, "question"): "<b>new</b>"})
+        return source_text(file_path, sheet_name)
+
+    monkeypatch.setattr(app, "_sheet_source_text", source_text_with_concurrent_save)
+    app.compact_formatted_questions(dry_run=False)
+
+    shard = app._overlay_shard_ref(app.shard_id(bank_path, "Paper 1")).get().to_dict()
+    assert shard["fields"]["question"] == {q1: "<b>new</b>"}
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from overlay_store import SheetOverlay
+
+
+def test_cell_text_normalizes_missing_values(app):
+    image = pd.Series([pd.NA], dtype="string")[0]
+    category = pd.Series([None, "x"], dtype="category")[0]
+    assert app._cell_text(image) == ""
+    assert app._cell_text(category) == ""
+    assert app._cell_text("a") == "a"
+
+
+def test_bulk_edit_back_to_original_drops_override(app):
+    overlay = SheetOverlay()
+    overlay.set("q1", "question", "edited")
+    originals = [{field: "" for field in app.BULK_EDIT_COLUMNS}]
+    originals[0]["question"] = "plain"
+    edited = [dict(originals[0])]
+    changes = app.bulk_overlay_changes(overlay, ["q1"], originals, edited)
+    assert changes == {("q1", "question"): None}
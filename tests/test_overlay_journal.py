@@ -0,0 +1,20 @@
+from overlay_store import OverlayJournal
+
+
+def test_replay_applies_journal_over_shard_backups(tmp_path):
+    journal = OverlayJournal(str(tmp_path), compact_every=2)
+    journal.append("bank", "Paper 1", {("q1", "question"): "first", ("q2", "question"): "two"})
+    journal.append("bank", "Paper 1", {("q1", "question"): "second"})  # compacts into shard files
+    journal.append("bank", "Paper 1", {("q2", "question"): None})
+
+    index = journal.replay()
+    assert index.sheet("bank", "Paper 1").to_storage() == {"question": {"q1": "second"}}
+
+    journal.append("bank", "Paper 1", {("q3", "option_a"): "new"})
+    assert journal.replay().get("bank", "Paper 1", "q3", "option_a") == "new"
+
+
+def test_offline_app_serves_local_backup(app, monkeypatch):
+    app.get_overlay_journal().append("bank", "Paper 1", {("q1", "question"): "<b>offline</b>"})
+    monkeypatch.setattr(app, "db", None)
+    assert app.load_formatted_questions("bank", "Paper 1").get("q1", "question") == "<b>offline</b>"
@@ -0,0 +1,40 @@
+from overlay_store import LEGACY_OVERLAY_DOCUMENTS, OVERLAY_COLLECTION
+
+
+def _legacy_overlay(db, bank_path):
+    db.collection(OVERLAY_COLLECTION).document(LEGACY_OVERLAY_DOCUMENTS[0]).set({
+        f"{bank_path}::Paper 1::0::question": "<b>one</b>",
+        f"{bank_path}::Paper 1::2::option_a": "<i>a</i>",
+    })
+
+
+def test_migration_rekeys_rows_to_question_ids(app, db, bank_path):
+    _legacy_overlay(db, bank_path)
+    q0, _, q2 = app.get_question_bank(bank_path)["Paper 1"]["Question ID"]
+
+    versions = app._read_overlay_versions()
+
+    assert len(versions) == 1
+    sheet_overlay = app.load_formatted_questions(bank_path, "Paper 1")
+    assert sheet_overlay.get(q0, "question") == "<b>one</b>"
+    assert sheet_overlay.get(q2, "option_a") == "<i>a</i>"
+
+
+def test_migration_keeps_overrides_when_bank_is_unavailable(app, db, bank_path, monkeypatch):
+    _legacy_overlay(db, bank_path)
+    q0, _, q2 = app.get_question_bank(bank_path)["Paper 1"]["Question ID"]
+    get_question_bank = app.get_question_bank
+
+    def unreadable(file_path):
+        raise OSError("bank is being replaced")
+
+    monkeypatch.setattr(app, "get_question_bank", unreadable)
+    app._read_overlay_versions()
+    assert "keyed_by" not in app._overlay_version_ref().get().to_dict()
+
+    # Next start: the bank loads again and the kept rows are rekeyed
+    monkeypatch.setattr(app, "get_question_bank", get_question_bank)
+    app._read_overlay_versions()
+    assert app._overlay_version_ref().get().to_dict()["keyed_by"] == "question_id"
+    shard = app._overlay_shard_ref(app.shard_id(bank_path, "Paper 1")).get().to_dict()
+    assert shard["fields"] == {"question": {q0: "<b>one</b>"}, "option_a": {q2: "<i>a</i>"}}
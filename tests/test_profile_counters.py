@@ -0,0 +1,60 @@
+import threading
+
+import pandas as pd
+
+
+def _submit(app, marks, exam="E", is_retest=False):
+    app.update_user_progress({
+        "Marks Obtained": marks, "Total Marks": 5, "Correct": marks, "Total Questions": 5,
+        "Exam Name": exam, "is_retest": is_retest,
+    })
+
+
+def _counters(app, username="bob"):
+    profile = app._profile_ref(username).get().to_dict()
+    return {key: profile.get(key) for key in
+            ("tests_taken", "total_score", "total_correct", "total_questions", "attempts_by_exam")}
+
+
+def _setup(app, monkeypatch):
+    import streamlit as st
+    st.session_state.username = "bob"
+    st.session_state.quiz_questions = pd.DataFrame({"Question": ["a"]})
+    app.initialize_user_progress("bob")
+    stamps = iter(range(1, 100))
+    monkeypatch.setattr(app, "now_ist", lambda: pd.Timestamp(2026, 1, next(stamps), tz="Asia/Kolkata"))
+
+
+def test_submit_and_delete_update_counters_without_history_reads(app, db, monkeypatch):
+    _setup(app, monkeypatch)
+    _submit(app, 4)
+    _submit(app, 2, is_retest=True)
+    first = next(doc.id for doc in app._tests_collection("bob").stream()
+                 if not doc.to_dict()["is_retest"])
+
+    db.reset_stats()
+    assert app.delete_test_entry("bob", first)
+    assert db.stats()["reads"] == 1
+
+    assert _counters(app) == {"tests_taken": 1, "total_score": 2.0, "total_correct": 2,
+                              "total_questions": 5, "attempts_by_exam": {"E": 0}}
+
+
+def test_concurrent_deletes_subtract_once(app, monkeypatch):
+    _setup(app, monkeypatch)
+    _submit(app, 4)
+    _submit(app, 3)
+    test_id = next(app._tests_collection("bob").stream()).id
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(app._delete_attempt_in_transaction(
+        app.db.transaction(), "bob", test_id))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False, False, False, True]
+    assert app.delete_test_entry("bob", test_id) is False
+    assert _counters(app)["tests_taken"] == 1
+    assert _counters(app)["attempts_by_exam"] == {"E": 1}
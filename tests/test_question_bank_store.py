@@ -0,0 +1,48 @@
+import pandas as pd
+
+import question_bank_store
+from conftest import QB_HEADER, write_workbook
+from question_bank_store import QUESTION_ID_COLUMN, load_compiled_bank
+
+
+def test_streamed_rows_match_read_excel(tmp_path, qb_cache):
+    path = str(tmp_path / "QB.xlsx")
+    write_workbook(path, {"Paper 1": [
+        QB_HEADER,
+        ["one", "a", "b", "c", "d", "A"],
+        [None] * 6,
+        ["two", "a", "b", "c", "d", "B"],
+        ["three", "a", "b", "c", "d", "C"],
+        [None] * 6,
+        [None] * 6,
+    ]})
+
+    expected = pd.read_excel(path, sheet_name="Paper 1", engine="openpyxl")
+    compiled = load_compiled_bank(path)["Paper 1"]
+
+    assert len(compiled) == len(expected) == 4
+    assert list(compiled["Question"].fillna("")) == ["one", "", "two", "three"]
+    assert compiled[QUESTION_ID_COLUMN].is_unique
+
+
+def test_prewarm_retries_banks_lost_to_a_crashed_worker(tmp_path, monkeypatch):
+    banks = [str(tmp_path / name / "QB.xlsx") for name in ("a", "b", "c")]
+    monkeypatch.setattr(question_bank_store, "find_question_banks", lambda root: banks)
+    calls = []
+
+    def fake_pool(paths, workers, report):
+        calls.append(list(paths))
+        if len(paths) > 1:
+            # The worker compiling "b" crashed and took "c" down with the pool
+            report({"path": paths[0], "ok": True, "compiled": True, "seconds": 0.1, "error": None})
+            return paths[1:]
+        if paths[0] == banks[1]:
+            return paths
+        report({"path": paths[0], "ok": True, "compiled": True, "seconds": 0.1, "error": None})
+        return []
+
+    monkeypatch.setattr(question_bank_store, "_run_prewarm_pool", fake_pool)
+    results = {r["path"]: r for r in question_bank_store.prewarm_question_banks(str(tmp_path))}
+
+    assert calls[1:] == [[banks[1]], [banks[2]]]
+    assert [results[path]["ok"] for path in banks] == [True, False, True]
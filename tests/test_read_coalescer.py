@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from read_coalescer import RunReads, SingleFlight
+
+
+def _start_slow_load(flight, key, value, started, release):
+    results = []
+
+    def loader():
+        started.set()
+        release.wait(5)
+        return value
+
+    thread = threading.Thread(target=lambda: results.append(flight.do(key, loader)))
+    thread.start()
+    started.wait(5)
+    return thread, results
+
+
+def test_concurrent_callers_share_one_load():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    leader, leader_results = _start_slow_load(flight, ("profile", "bob"), "old", started, release)
+
+    follower_results = []
+    follower = threading.Thread(target=lambda: follower_results.append(flight.do(("profile", "bob"), lambda: "unused")))
+    follower.start()
+    # Release the leader only once the follower has joined its load
+    deadline = time.monotonic() + 5
+    while flight.stats()["shared"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert leader_results == follower_results == ["old"]
+    assert flight.stats()["loads"] == 1 and flight.stats()["shared"] == 1
+
+
+def test_callers_after_a_write_do_not_join_older_loads():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    leader, _ = _start_slow_load(flight, ("profile", "bob"), "before write", started, release)
+
+    # This session writes, then reads again while the older load is in flight
+    reads = RunReads(flight)
+    reads.invalidate("profile", "bob")
+    assert reads.get(("profile", "bob"), lambda: "after write") == "after write"
+
+    release.set()
+    leader.join()
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_caller_and_are_memoized():
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ValueError("sheet is missing columns")
+
+    reads = RunReads(SingleFlight())
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            reads.get(("admin_credentials",), failing)
+    assert len(calls) == 1
+
+
+def test_results_are_copies():
+    reads = RunReads()
+    reads.get(("user", "bob"), lambda: {"role": "student"})["role"] = "admin"
+    assert reads.get(("user", "bob"), lambda: None) == {"role": "student"}
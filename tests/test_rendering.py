@@ -0,0 +1,44 @@
+import pytest
+
+
+def test_plain_text_on_words_survive_sanitizing(app):
+    content = "<b>If one = 2x</b>, find x. Note: once = twice"
+    body, unsafe_allow_html = app.render_fragment(content)
+    assert unsafe_allow_html
+    assert "<b>If one = 2x</b>, find x. Note: once = twice" in body
+
+
+def test_allowed_formatting_is_kept(app):
+    content = '<p><span style="color: red; font-size: 18px">red</span> <i>it</i><br><img src="https://x/a.png" style="width: 10px"></p>'
+    cleaned = app.sanitize_formatted_html(content)
+    assert '<span style="color:red;font-size:18px">red</span>' in cleaned
+    assert "<i>it</i>" in cleaned
+    assert '<img src="https://x/a.png" style="width:10px">' in cleaned
+
+
+@pytest.mark.parametrize("payload", [
+    '<b onclick="steal()">x</b>',
+    "<img/onerror=alert(1) src=a.png>",
+    '<a href="javascript:go()">y</a>',
+    '<a href="&#106;avascript:go()">y</a>',
+    '<a href="jav&#x09;ascript:go()">y</a>',
+    '<img src="&#106;avascript:go()">',
+    '<form action="javascript:go()"><b>f</b></form>',
+    "<scr<script>ipt>alert(1)</script>",
+    '<span style="background: url(javascript:go())">s</span>',
+])
+def test_script_vectors_are_removed(app, payload):
+    cleaned = app.sanitize_formatted_html(payload).lower()
+    for marker in ("javascript", "&#106;", "onclick", "onerror", "<form", "<script", "<a "):
+        assert marker not in cleaned
+
+
+@pytest.mark.parametrize("tag", ['<embed src="a.swf">', '<object data="a.swf">'])
+def test_unclosed_embeds_do_not_swallow_the_text_after_them(app, tag):
+    cleaned = app.sanitize_formatted_html(f"<b>before</b>{tag}<i>after</i> the end")
+    assert cleaned.startswith("<b>before</b>")
+    assert cleaned.endswith("<i>after</i> the end")
+
+
+def test_script_blocks_are_removed(app):
+    assert app.sanitize_formatted_html("<p>a</p><script>alert(1)</script>") == "<p>a</p>"
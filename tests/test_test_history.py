@@ -0,0 +1,36 @@
+def test_history_pages_do_not_skip_equal_timestamps(app):
+    summaries = app._test_summaries_collection("bob")
+    for i in range(7):
+        # Unparseable legacy dates all map to the same date_ts
+        summaries.document(f"t{i}").set(app.test_summary({"test_id": f"t{i}", "date": "not a date", "score": i}))
+
+    seen, after = [], None
+    while True:
+        page, has_more = app.load_test_summary_page("bob", after=after, limit=3)
+        seen.extend(item["test_id"] for item in page)
+        if not has_more:
+            break
+        after = page[-1]
+
+    assert sorted(seen) == [f"t{i}" for i in range(7)]
+    assert len(seen) == len(set(seen))
+
+
+def test_backfill_adds_sort_key_and_recounts_profile(app):
+    app.initialize_user_progress("bob")
+    tests = app._tests_collection("bob")
+    for i, (score, is_retest) in enumerate([(4, False), (3, True), (5, False)]):
+        tests.document(f"t{i}").set({"test_id": f"t{i}", "date": f"2026-01-0{i + 1}T10:00:00",
+                                     "exam_name": "E", "score": score, "correct": score,
+                                     "total_questions": 5, "is_retest": is_retest})
+    # A version-2 profile whose counters drifted from its attempts
+    app._profile_ref("bob").update({"test_summaries_version": 2, "tests_taken": 9, "total_score": 1})
+
+    profile = app.ensure_test_summaries("bob", app._profile_ref("bob").get().to_dict())
+
+    assert profile["tests_taken"] == 3 and profile["total_score"] == 12.0
+    assert profile["attempts_by_exam"] == {"E": 2}
+    stored = app._profile_ref("bob").get().to_dict()
+    assert (stored["tests_taken"], stored["total_score"], stored["test_summaries_version"]) == (3, 12.0, 3)
+    page, has_more = app.load_test_summary_page("bob", limit=2)
+    assert [item["test_id"] for item in page] == ["t2", "t1"] and has_more